@@ -7,72 +7,329 @@ Analyzes scene clips and aligns them to measure timestamps for precise cutting.
 import sys
 import os
 import json
-import subprocess
-from pathlib import Path
-
-
-def get_video_duration(video_file):
-    """Get duration of a video file in seconds."""
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "json",
-        video_file
-    ]
+import functools
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import numpy as np
+from media import get_media_duration
+from cache import CACHE_DIR, atomic_write
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """Fallback when Numba isn't installed: run the function as plain Python."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+# Probed durations, keyed by path + mtime + size so edited files are re-probed
+DURATION_CACHE_FILE = os.path.join(CACHE_DIR, "duration_cache.json")
+
+
+@dataclass
+class SceneTable:
+    """
+    Scene alignment plan stored as parallel NumPy arrays (one entry per scene part).
     
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    data = json.loads(result.stdout)
-    return float(data["format"]["duration"])
+    Columns are in scene plan file order, so aggregations and filters run as
+    vectorized array operations instead of per-dict lookups.
+    """
+    file: np.ndarray               # object (scene file name)
+    part: np.ndarray               # int32
+    total_parts: np.ndarray        # int32
+    start_offset: np.ndarray       # float64
+    original_duration: np.ndarray  # float64
+    trim_to: np.ndarray            # float64
+    closest_measure: np.ndarray    # int32 (1-based, 0 = none)
+    measure_time: np.ndarray       # float64
+    time_lost: np.ndarray          # float64
+    
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a table from (file, part, total_parts, ...) tuples in column order."""
+        columns = list(zip(*rows)) if rows else [()] * 9
+        return cls(
+            file=np.asarray(columns[0], dtype=object),
+            part=np.asarray(columns[1], dtype=np.int32),
+            total_parts=np.asarray(columns[2], dtype=np.int32),
+            start_offset=np.asarray(columns[3], dtype=np.float64),
+            original_duration=np.asarray(columns[4], dtype=np.float64),
+            trim_to=np.asarray(columns[5], dtype=np.float64),
+            closest_measure=np.asarray(columns[6], dtype=np.int32),
+            measure_time=np.asarray(columns[7], dtype=np.float64),
+            time_lost=np.asarray(columns[8], dtype=np.float64),
+        )
+    
+    def __len__(self):
+        return len(self.file)
+    
+    def to_plan(self):
+        """Convert to the list-of-dicts plan format used by assemble_video."""
+        return [
+            {
+                'file': str(self.file[i]),
+                'part': int(self.part[i]),
+                'total_parts': int(self.total_parts[i]),
+                'start_offset': float(self.start_offset[i]),
+                'original_duration': float(self.original_duration[i]),
+                'trim_to': float(self.trim_to[i]),
+                'measure_number': int(self.closest_measure[i]),
+                'measure_time': float(self.measure_time[i]),
+                'time_lost': float(self.time_lost[i]),
+            }
+            for i in range(len(self))
+        ]
+
+
+def _duration_cache_key(video_file):
+    """Build the cache key for a video file from its path, mtime and size."""
+    stat = os.stat(video_file)
+    return f"{os.path.abspath(video_file)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+@functools.lru_cache(maxsize=None)
+def _load_duration_cache():
+    """Load the on-disk duration cache (once per process)."""
+    try:
+        with open(DURATION_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_duration_cache(cache):
+    """Save the duration cache, dropping entries for files that no longer exist."""
+    cache = {key: duration for key, duration in cache.items()
+             if os.path.exists(key.rsplit('|', 2)[0])}
+    try:
+        atomic_write(DURATION_CACHE_FILE, lambda f: json.dump(cache, f), mode='w')
+    except OSError as e:
+        print(f"  ⚠ Warning: Could not save duration cache: {e}")
+
+
+def get_video_durations(video_files, use_cache=True):
+    """
+    Get durations of many video files at once.
+    
+    Durations are cached on disk, so unchanged files are never re-probed.
+    Uncached files are probed concurrently with get_media_duration.
+    
+    Args:
+        video_files: Iterable of video file paths
+        use_cache: Read and update the on-disk cache (disable for files in a
+                   temporary directory, which can never be looked up again)
+    
+    Returns:
+        Dict mapping each path to its duration in seconds
+    """
+    video_files = list(video_files)
+    cache = _load_duration_cache() if use_cache else {}
+    keys = {path: _duration_cache_key(path) for path in video_files}
+    missing = [path for path in video_files if keys[path] not in cache]
+    
+    if missing:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            probed = list(executor.map(get_media_duration, missing))
+        
+        for path, duration in zip(missing, probed):
+            cache[keys[path]] = duration
+        if use_cache:
+            _save_duration_cache(cache)
+    
+    return {path: cache[keys[path]] for path in video_files}
+
+
+def _scene_sort_key(name):
+    """Sort scene_N.mp4 files by their number (so scene_10 follows scene_9)."""
+    number = name[len("scene_"):-len(".mp4")]
+    return (0, int(number), name) if number.isdigit() else (1, 0, name)
+
+
+def list_scene_files(scenes_dir):
+    """
+    List scene clips in a directory in scene order.
+    
+    Returns:
+        List of os.DirEntry objects for scene_*.mp4 files
+    """
+    with os.scandir(scenes_dir) as it:
+        entries = [entry for entry in it
+                   if entry.name.startswith("scene_") and entry.name.endswith(".mp4")]
+    
+    entries.sort(key=lambda entry: _scene_sort_key(entry.name))
+    return entries
 
 
 def load_measures(measures_file):
-    """Load measure timestamps from file."""
-    measures = []
-    with open(measures_file, 'r') as f:
+    """Load measure timestamps from a text or .npy file as a NumPy array."""
+    if str(measures_file).endswith('.npy'):
+        return np.load(measures_file).astype(np.float64, copy=False)
+    
+    # Parse CSV format: measure_number, timestamp. Comments, blank lines and
+    # malformed rows are skipped rather than failing the whole file
+    def timestamps(f):
         for line in f:
             line = line.strip()
-            # Skip comments and empty lines
             if not line or line.startswith('#'):
                 continue
-            
-            # Parse CSV format: measure_number, timestamp
+            parts = line.split(',')
+            if len(parts) < 2:
+                continue
             try:
-                parts = line.split(',')
-                if len(parts) >= 2:
-                    timestamp = float(parts[1].strip())
-                    measures.append(timestamp)
-            except (ValueError, IndexError):
+                yield float(parts[1])
+            except ValueError:
                 continue
     
-    return measures
+    with open(measures_file, 'r') as f:
+        return np.fromiter(timestamps(f), dtype=np.float64)
 
 
-def find_closest_measure_before(target_time, measures):
+@njit(cache=True)
+def plan_scene(duration, measures, max_scene_duration):
     """
-    Find the measure timestamp closest to but not exceeding target_time.
+    Work out how to cut one scene so each part ends on a measure.
+    
+    Pure numeric core of the alignment, JIT-compiled with Numba when available.
     
     Args:
-        target_time: The time we want to get close to
-        measures: List of measure timestamps
+        duration: Scene duration in seconds
+        measures: Array of measure timestamps (float64, sorted ascending)
+        max_scene_duration: Maximum part length in seconds (inf = no splitting)
     
     Returns:
-        (measure_index, measure_time) or (None, None) if none found
+        (start_offsets, part_durations, trim_durations, measure_numbers,
+         measure_times, time_lost) arrays with one entry per part
     """
-    best_index = None
-    best_time = None
+    # Split scenes that are too long into equal chunks
+    if duration > max_scene_duration:
+        num_parts = int(duration / max_scene_duration) + 1
+        step = max_scene_duration
+    else:
+        num_parts = 1
+        step = duration
+    
+    start_offsets = np.empty(num_parts)
+    part_durations = np.empty(num_parts)
+    trim_durations = np.empty(num_parts)
+    measure_numbers = np.empty(num_parts, dtype=np.int64)
+    measure_times = np.empty(num_parts)
+    time_lost = np.empty(num_parts)
     
-    for i, measure_time in enumerate(measures):
-        if measure_time <= target_time:
-            best_index = i
-            best_time = measure_time
+    for part in range(num_parts):
+        start_time = part * step
+        end_time = min((part + 1) * step, duration)
+        part_duration = end_time - start_time
+        
+        # Find closest measure for this part's end
+        index = np.searchsorted(measures, part_duration, side='right') - 1
+        
+        start_offsets[part] = start_time
+        part_durations[part] = part_duration
+        if index >= 0:
+            trim_durations[part] = measures[index]
+            measure_numbers[part] = index + 1
+            measure_times[part] = measures[index]
+            time_lost[part] = part_duration - measures[index]
         else:
-            break  # Past our target, stop searching
+            # Part is shorter than first measure, keep as is
+            trim_durations[part] = part_duration
+            measure_numbers[part] = 1
+            measure_times[part] = 0.0
+            time_lost[part] = 0.0
+    
+    return start_offsets, part_durations, trim_durations, measure_numbers, measure_times, time_lost
+
+
+def _plan_simple(scene_files, durations, measures):
+    """
+    Plan scenes that are never split: one part per scene, computed for all
+    scenes at once with a single vectorized measure lookup.
+    
+    Returns:
+        SceneTable with one entry per scene
+    """
+    names = np.array([scene_file.name for scene_file in scene_files], dtype=object)
+    scene_durations = np.array([durations[scene_file.path] for scene_file in scene_files], dtype=np.float64)
+    
+    # Find the closest measure to the end of each scene
+    indices = np.searchsorted(measures, scene_durations, side='right') - 1
+    found = indices >= 0
+    if len(measures):
+        measure_times = np.where(found, measures[np.maximum(indices, 0)], 0.0)
+    else:
+        measure_times = np.zeros_like(scene_durations)
     
-    return best_index, best_time
+    # Scenes shorter than the first measure are kept as is
+    trim_durations = np.where(found, measure_times, scene_durations)
+    measure_numbers = np.where(found, indices + 1, 1)
+    time_lost = scene_durations - trim_durations
+    
+    # Report all scenes with a single write rather than one print per scene
+    print("\n".join(
+        f"  {name}: {duration:.2f}s → trim to {trim_to:.2f}s (measure {measure_number}, lose {lost:.2f}s)"
+        for name, duration, trim_to, measure_number, lost
+        in zip(names, scene_durations, trim_durations, measure_numbers, time_lost)
+    ))
+    
+    count = len(names)
+    return SceneTable(
+        file=names,
+        part=np.ones(count, dtype=np.int32),
+        total_parts=np.ones(count, dtype=np.int32),
+        start_offset=np.zeros(count, dtype=np.float64),
+        original_duration=scene_durations,
+        trim_to=trim_durations,
+        closest_measure=measure_numbers.astype(np.int32),
+        measure_time=measure_times,
+        time_lost=time_lost,
+    )
 
 
-def align_scenes_to_measures(scenes_dir, measures_file, output_file="scene_plan.txt", max_measures=None):
+def _plan_with_split(scene_files, durations, measures, max_scene_duration, max_measures):
+    """
+    Plan scenes, splitting those longer than max_scene_duration into parts.
+    
+    Returns:
+        SceneTable with one entry per scene part
+    """
+    scene_data = []
+    report = []  # Buffered and printed once at the end
+    
+    for scene_file in scene_files:
+        scene_name = scene_file.name
+        duration = durations[scene_file.path]
+        
+        (start_offsets, part_durations, trim_durations,
+         measure_numbers, measure_times, time_lost) = plan_scene(duration, measures, max_scene_duration)
+        num_parts = len(start_offsets)
+        
+        if num_parts > 1:
+            report.append(f"  {scene_name}: {duration:.2f}s - SPLITTING (exceeds {max_measures} measures)")
+        
+        for part in range(num_parts):
+            scene_data.append((scene_name, part + 1, num_parts, float(start_offsets[part]),
+                               float(part_durations[part]), float(trim_durations[part]),
+                               int(measure_numbers[part]), float(measure_times[part]),
+                               float(time_lost[part])))
+            
+            if num_parts > 1:
+                report.append(f"    Part {part+1}/{num_parts}: {part_durations[part]:.2f}s → {trim_durations[part]:.2f}s "
+                              f"(measure {measure_numbers[part]}, lose {time_lost[part]:.2f}s)")
+            else:
+                report.append(f"  {scene_name}: {duration:.2f}s → trim to {trim_durations[part]:.2f}s "
+                              f"(measure {measure_numbers[part]}, lose {time_lost[part]:.2f}s)")
+    
+    print("\n".join(report))
+    
+    # Convert to structure-of-arrays for writing and summary statistics
+    return SceneTable.from_rows(scene_data)
+
+
+def align_scenes_to_measures(scenes_dir, measures_file, output_file="scene_plan.txt", max_measures=None,
+                             use_cache=True):
     """
     Analyze scene clips and align them to measure timestamps.
     
@@ -81,13 +338,23 @@ def align_scenes_to_measures(scenes_dir, measures_file, output_file="scene_plan.
     
     Args:
         scenes_dir: Directory containing scene MP4 files
-        measures_file: File containing measure timestamps
-        output_file: Output file for the alignment plan
+        measures_file: File containing measure timestamps, or an array of them
+        output_file: Output file for the alignment plan (None = don't save).
+                     A .pkl path pickles the plan for assemble_video instead of text.
         max_measures: Maximum length in measures for a scene (None = no limit)
+        use_cache: Keep probed scene durations in the on-disk cache (disable
+                   when scenes_dir is a temporary directory)
+    
+    Returns:
+        SceneTable with one entry per scene part
     """
-    print(f"Loading measures from: {measures_file}")
-    measures = load_measures(measures_file)
-    print(f"✓ Loaded {len(measures)} measure timestamps")
+    if isinstance(measures_file, (str, os.PathLike)):
+        print(f"Loading measures from: {measures_file}")
+        measures = load_measures(measures_file)
+        print(f"✓ Loaded {len(measures)} measure timestamps")
+    else:
+        measures = np.asarray(measures_file, dtype=np.float64)
+        print(f"✓ Using {len(measures)} measure timestamps")
     
     if max_measures:
         print(f"✓ Max scene length: {max_measures} measures")
@@ -95,7 +362,7 @@ def align_scenes_to_measures(scenes_dir, measures_file, output_file="scene_plan.
     print(f"\nAnalyzing scenes in: {scenes_dir}")
     
     # Get all scene files sorted
-    scene_files = sorted(Path(scenes_dir).glob("scene_*.mp4"))
+    scene_files = list_scene_files(scenes_dir)
     
     if not scene_files:
         print(f"❌ No scene files found in {scenes_dir}")
@@ -104,142 +371,98 @@ def align_scenes_to_measures(scenes_dir, measures_file, output_file="scene_plan.
     print(f"✓ Found {len(scene_files)} scene files")
     
     # Calculate average measure duration for max length calculation
+    max_scene_duration = np.inf
     if len(measures) > 1 and max_measures:
-        measure_intervals = [measures[i+1] - measures[i] for i in range(len(measures)-1)]
-        avg_measure_duration = sum(measure_intervals) / len(measure_intervals)
+        avg_measure_duration = float(np.diff(measures).mean())
         max_scene_duration = max_measures * avg_measure_duration
         print(f"  Average measure duration: {avg_measure_duration:.2f}s")
         print(f"  Max scene duration: {max_scene_duration:.2f}s ({max_measures} measures)")
     
-    # Analyze each scene
-    scene_data = []
+    # Probe all scene durations in one batch before the main loop
+    durations = get_video_durations((scene_file.path for scene_file in scene_files), use_cache)
     
-    for scene_file in scene_files:
-        scene_name = scene_file.name
-        duration = get_video_duration(str(scene_file))
-        
-        # If max_measures is set and scene is too long, split it
-        if max_measures and duration > max_scene_duration:
-            print(f"  {scene_name}: {duration:.2f}s - SPLITTING (exceeds {max_measures} measures)")
-            
-            # Split into multiple parts
-            num_parts = int(duration / max_scene_duration) + 1
-            for part in range(num_parts):
-                start_time = part * max_scene_duration
-                end_time = min((part + 1) * max_scene_duration, duration)
-                part_duration = end_time - start_time
-                
-                # Find closest measure for this part's end
-                closest_measure_idx, closest_measure_time = find_closest_measure_before(part_duration, measures)
-                
-                if closest_measure_time is not None:
-                    trim_duration = closest_measure_time
-                    time_lost = part_duration - trim_duration
-                else:
-                    trim_duration = part_duration
-                    time_lost = 0.0
-                    closest_measure_idx = 0
-                
-                scene_info = {
-                    'file': scene_name,
-                    'part': part + 1,
-                    'total_parts': num_parts,
-                    'start_offset': start_time,
-                    'original_duration': part_duration,
-                    'trim_to': trim_duration,
-                    'time_lost': time_lost,
-                    'closest_measure': closest_measure_idx + 1 if closest_measure_idx is not None else 0,
-                    'measure_time': closest_measure_time if closest_measure_time is not None else 0.0
-                }
-                
-                scene_data.append(scene_info)
-                print(f"    Part {part+1}/{num_parts}: {part_duration:.2f}s → {trim_duration:.2f}s "
-                      f"(measure {scene_info['closest_measure']}, lose {time_lost:.2f}s)")
-        else:
-            # Scene is within limit, process normally
-            # Find the closest measure to the end of this scene
-            closest_measure_idx, closest_measure_time = find_closest_measure_before(duration, measures)
-            
-            if closest_measure_time is not None:
-                trim_duration = closest_measure_time
-                time_lost = duration - trim_duration
-            else:
-                # Scene is shorter than first measure, keep as is
-                trim_duration = duration
-                time_lost = 0.0
-                closest_measure_idx = 0
-            
-            scene_info = {
-                'file': scene_name,
-                'part': 1,
-                'total_parts': 1,
-                'start_offset': 0.0,
-                'original_duration': duration,
-                'trim_to': trim_duration,
-                'time_lost': time_lost,
-                'closest_measure': closest_measure_idx + 1 if closest_measure_idx is not None else 0,
-                'measure_time': closest_measure_time if closest_measure_time is not None else 0.0
-            }
-            
-            scene_data.append(scene_info)
-            
-            print(f"  {scene_name}: {duration:.2f}s → trim to {trim_duration:.2f}s "
-                  f"(measure {scene_info['closest_measure']}, lose {time_lost:.2f}s)")
+    # Analyze each scene (the no-split path is one vectorized step for all scenes)
+    if np.isinf(max_scene_duration):
+        table = _plan_simple(scene_files, durations, measures)
+    else:
+        table = _plan_with_split(scene_files, durations, measures, max_scene_duration, max_measures)
     
     # Save the plan
-    print(f"\nSaving alignment plan to: {output_file}")
-    
-    with open(output_file, 'w') as f:
-        f.write("# Scene Alignment Plan\n")
-        f.write("# Each scene will be trimmed to align with measure timestamps\n")
-        if max_measures:
-            f.write(f"# Max scene length: {max_measures} measures\n")
-        f.write("#\n")
-        f.write("# Format: scene_file, part, total_parts, start_offset, original_duration, trim_to_duration, measure_number, measure_time, time_lost\n")
-        f.write("#\n")
+    if output_file and str(output_file).endswith('.pkl'):
+        print(f"\nSaving alignment plan to: {output_file}")
         
-        for scene in scene_data:
-            f.write(f"{scene['file']}, {scene['part']}, {scene['total_parts']}, {scene['start_offset']:.6f}, "
-                   f"{scene['original_duration']:.6f}, {scene['trim_to']:.6f}, "
-                   f"{scene['closest_measure']}, {scene['measure_time']:.6f}, {scene['time_lost']:.6f}\n")
-    
-    print(f"✓ Saved alignment plan for {len(scene_data)} scene parts")
+        with open(output_file, 'wb') as f:
+            pickle.dump(table.to_plan(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        
+        print(f"✓ Saved alignment plan for {len(table)} scene parts")
+    elif output_file:
+        print(f"\nSaving alignment plan to: {output_file}")
+        
+        with open(output_file, 'w') as f:
+            f.write("# Scene Alignment Plan\n")
+            f.write("# Each scene will be trimmed to align with measure timestamps\n")
+            if max_measures:
+                f.write(f"# Max scene length: {max_measures} measures\n")
+            f.write("#\n")
+            f.write("# Format: scene_file, part, total_parts, start_offset, original_duration, trim_to_duration, measure_number, measure_time, time_lost\n")
+            f.write("#\n")
+            
+            columns = np.column_stack([
+                table.file, table.part, table.total_parts, table.start_offset,
+                table.original_duration, table.trim_to,
+                table.closest_measure, table.measure_time, table.time_lost
+            ])
+            np.savetxt(f, columns, fmt="%s, %d, %d, %.6f, %.6f, %.6f, %d, %.6f, %.6f")
+        
+        print(f"✓ Saved alignment plan for {len(table)} scene parts")
     
     # Print summary statistics
-    total_original = sum(s['original_duration'] for s in scene_data)
-    total_trimmed = sum(s['trim_to'] for s in scene_data)
-    total_lost = sum(s['time_lost'] for s in scene_data)
-    
-    print("\n" + "="*70)
-    print("Summary:")
-    print(f"  Total scene parts:       {len(scene_data)}")
-    print(f"  Total original duration: {total_original:.2f}s")
-    print(f"  Total after trimming:    {total_trimmed:.2f}s")
-    print(f"  Total time trimmed:      {total_lost:.2f}s ({total_lost/total_original*100:.1f}%)")
-    print("="*70)
+    # time_lost is original_duration - trim_to per part, so its total needs no extra pass
+    total_original = float(table.original_duration.sum())
+    total_trimmed = float(table.trim_to.sum())
+    total_lost = total_original - total_trimmed
+    lost_percent = total_lost / total_original * 100 if total_original > 0 else 0.0
+    
+    summary = [
+        "\n" + "="*70,
+        "Summary:",
+        f"  Total scene parts:       {len(table)}",
+        f"  Total original duration: {total_original:.2f}s",
+        f"  Total after trimming:    {total_trimmed:.2f}s",
+        f"  Total time trimmed:      {total_lost:.2f}s ({lost_percent:.1f}%)",
+        "="*70,
+    ]
     
     # Show which scenes get trimmed the most
-    print("\nScenes with significant trimming (>1s):")
-    significant = [s for s in scene_data if s['time_lost'] > 1.0]
-    if significant:
-        for scene in sorted(significant, key=lambda x: x['time_lost'], reverse=True):
-            part_info = f" (part {scene['part']}/{scene['total_parts']})" if scene['total_parts'] > 1 else ""
-            print(f"  {scene['file']}{part_info}: {scene['original_duration']:.2f}s → {scene['trim_to']:.2f}s "
-                  f"(lose {scene['time_lost']:.2f}s)")
+    summary.append("\nScenes with significant trimming (>1s):")
+    significant = np.flatnonzero(table.time_lost > 1.0)
+    if len(significant):
+        order = significant[np.argsort(-table.time_lost[significant], kind='stable')]
+        for i in order:
+            part_info = f" (part {table.part[i]}/{table.total_parts[i]})" if table.total_parts[i] > 1 else ""
+            summary.append(f"  {table.file[i]}{part_info}: {table.original_duration[i]:.2f}s → {table.trim_to[i]:.2f}s "
+                           f"(lose {table.time_lost[i]:.2f}s)")
     else:
-        print("  None - all scenes trim cleanly!")
+        summary.append("  None - all scenes trim cleanly!")
+    
+    print("\n".join(summary))
     
-    return scene_data
+    return table
 
 
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: python align_scenes.py <scenes_dir> <measures_file> [output_file] [max_measures]")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    
+    if len(args) < 2:
+        print("Usage: python align_scenes.py <scenes_dir> <measures_file> [output_file] [max_measures] [--no-cache]")
         print("\nArguments:")
         print("  scenes_dir    - Directory containing scene MP4 files")
-        print("  measures_file - File with measure timestamps (from filter_beats.py)")
-        print("  output_file   - Output file for alignment plan (default: scene_plan.txt)")
+        print("  measures_file - File with measure timestamps (from filter_beats.py, text or .npy)")
+        print("  output_file   - Output file for alignment plan (default: scene_plan.txt, .pkl = binary)")
         print("  max_measures  - Maximum scene length in measures (default: no limit)")
+        print("\nOptions:")
+        print("  --no-cache    - Don't read or update the scene duration cache")
+        print("                  (for scene clips in a temporary directory)")
         print("\nExample:")
         print("  python align_scenes.py scenes measures.txt")
         print("  python align_scenes.py scenes measures.txt scene_plan.txt")
@@ -249,10 +472,11 @@ def main():
         print("will be split into chunks of up to 16 measures each.")
         sys.exit(1)
     
-    scenes_dir = sys.argv[1]
-    measures_file = sys.argv[2]
-    output_file = sys.argv[3] if len(sys.argv) > 3 else "scene_plan.txt"
-    max_measures = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    scenes_dir = args[0]
+    measures_file = args[1]
+    output_file = args[2] if len(args) > 2 else "scene_plan.txt"
+    max_measures = int(args[3]) if len(args) > 3 else None
+    use_cache = "--no-cache" not in sys.argv[1:]
     
     # Handle case where output_file looks like a number (max_measures)
     if output_file.isdigit():
@@ -268,7 +492,7 @@ def main():
         sys.exit(1)
     
     try:
-        scene_data = align_scenes_to_measures(scenes_dir, measures_file, output_file, max_measures)
+        scene_data = align_scenes_to_measures(scenes_dir, measures_file, output_file, max_measures, use_cache)
         
         print(f"\n✅ Success! Alignment plan created.")
         print(f"\nThe plan shows how to trim each scene to align with measure boundaries.")
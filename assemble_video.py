@@ -6,71 +6,92 @@ Trims scenes according to the alignment plan and combines with music.
 
 import sys
 import os
+import csv
+import hashlib
+import heapq
+import json
+import pickle
 import subprocess
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from spinner import Spinner
+from media import HW_ENCODERS, video_codec_args, encode_workers, resolve_hwenc, get_media_duration
 
+try:
+    import av  # PyAV: in-process libavformat, avoids an ffprobe fork per probe
+except ImportError:
+    av = None
+
+
+# Above this many scenes, fall back to trimming each scene separately rather
+# than opening every scene as a simultaneous input of one filter graph
+MAX_FILTER_GRAPH_INPUTS = 64
+
+# Scene plan columns and their converters (see align_scenes.py for the format)
+PLAN_FIELDS = [
+    ('file', str),
+    ('part', int),
+    ('total_parts', int),
+    ('start_offset', float),
+    ('original_duration', float),
+    ('trim_to', float),
+    ('measure_number', int),
+    ('measure_time', float),
+    ('time_lost', float),
+]
+
+# Columns of the old 6-field plan format (before scene splitting)
+LEGACY_PLAN_FIELDS = [
+    ('file', str),
+    ('original_duration', float),
+    ('trim_to', float),
+    ('measure_number', int),
+    ('measure_time', float),
+    ('time_lost', float),
+]
 
 def load_scene_plan(plan_file):
     """
-    Load the scene alignment plan.
+    Load the scene alignment plan (text, or a .pkl written by align_scenes).
     
     Returns:
         List of dicts with scene information
     """
+    if str(plan_file).endswith('.pkl'):
+        with open(plan_file, 'rb') as f:
+            return pickle.load(f)
+    
     scenes = []
     
-    with open(plan_file, 'r') as f:
-        for line in f:
-            line = line.strip()
-            # Skip comments and empty lines
-            if not line or line.startswith('#'):
-                continue
-            
-            # Parse CSV format
+    with open(plan_file, 'r', newline='') as f:
+        # Skip comments and empty lines before handing rows to the CSV parser
+        lines = (line for line in f if line.strip() and not line.lstrip().startswith('#'))
+        
+        for row in csv.reader(lines, skipinitialspace=True):
             try:
-                parts = [p.strip() for p in line.split(',')]
-                
                 # Handle both old format (6 fields) and new format (9 fields)
-                if len(parts) >= 9:
+                if len(row) >= 9:
                     # New format with splitting support
-                    scene_info = {
-                        'file': parts[0],
-                        'part': int(parts[1]),
-                        'total_parts': int(parts[2]),
-                        'start_offset': float(parts[3]),
-                        'original_duration': float(parts[4]),
-                        'trim_to': float(parts[5]),
-                        'measure_number': int(parts[6]),
-                        'measure_time': float(parts[7]),
-                        'time_lost': float(parts[8])
-                    }
-                elif len(parts) >= 6:
+                    scene_info = {name: convert(value.strip()) for (name, convert), value
+                                  in zip(PLAN_FIELDS, row)}
+                elif len(row) >= 6:
                     # Old format (backward compatibility)
-                    scene_info = {
-                        'file': parts[0],
-                        'part': 1,
-                        'total_parts': 1,
-                        'start_offset': 0.0,
-                        'original_duration': float(parts[1]),
-                        'trim_to': float(parts[2]),
-                        'measure_number': int(parts[3]),
-                        'measure_time': float(parts[4]),
-                        'time_lost': float(parts[5])
-                    }
+                    scene_info = {name: convert(value.strip()) for (name, convert), value
+                                  in zip(LEGACY_PLAN_FIELDS, row)}
+                    scene_info.update(part=1, total_parts=1, start_offset=0.0)
                 else:
                     continue
-                    
+                
                 scenes.append(scene_info)
-            except (ValueError, IndexError) as e:
-                print(f"Warning: Could not parse line: {line}")
+            except ValueError:
+                print(f"Warning: Could not parse line: {', '.join(row)}")
                 continue
     
     return scenes
 
 
-def trim_scene(scene_path, duration, output_path, start_offset=0.0):
+def trim_scene(scene_path, duration, output_path, start_offset=0.0, hwenc=None):
     """
     Trim a scene to the specified duration, optionally starting from an offset.
     
@@ -79,15 +100,35 @@ def trim_scene(scene_path, duration, output_path, start_offset=0.0):
         duration: Duration to trim to in seconds
         output_path: Path for trimmed output
         start_offset: Start time offset in seconds (for splitting long scenes)
+        hwenc: Hardware encoder name for re-encoding (None = libx264)
+    
+    Scenes cut from the start begin on a keyframe, so they are stream-copied
+    without decoding. Offset cuts (or a failed copy) are re-encoded.
     """
+    if start_offset <= 0.0:
+        cmd = [
+            "ffmpeg",
+            "-i", scene_path,
+            "-t", str(duration),
+            "-c", "copy",
+            "-an",
+            "-avoid_negative_ts", "make_zero",
+            "-y",
+            output_path
+        ]
+        
+        try:
+            subprocess.run(cmd, capture_output=True, check=True)
+            return
+        except subprocess.CalledProcessError:
+            pass  # Fall back to re-encoding below
+    
     cmd = [
         "ffmpeg",
         "-i", scene_path,
         "-ss", str(start_offset),  # Start from offset
         "-t", str(duration),        # Duration
-        "-c:v", "libx264",
-        "-preset", "fast",
-        "-crf", "23",
+        *video_codec_args(hwenc, preset="fast"),
         "-an",  # Keep it silent
         "-y",
         output_path
@@ -96,135 +137,308 @@ def trim_scene(scene_path, duration, output_path, start_offset=0.0):
     subprocess.run(cmd, capture_output=True, check=True)
 
 
-def concatenate_videos(video_files, output_path):
+def video_stream_params(video_path):
+    """
+    Get the parameters that must match for video streams to be concatenated without re-encoding.
+    
+    The codec extradata (H.264 SPS/PPS) is included because the concat
+    demuxer keeps only the first file's, so clips that differ there decode
+    corrupted after a stream copy.
+    
+    Returns:
+        Tuple of (codec, profile, width, height, pixel format, time base, extradata hash)
+    
+    Raises:
+        ValueError: If the extradata can't be read, so the clips can't be
+                    safely compared
+    """
+    if av is not None:
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            ctx = stream.codec_context
+            if not ctx.extradata:
+                raise ValueError(f"No codec extradata in {video_path}")
+            return (ctx.name, ctx.profile, ctx.width, ctx.height,
+                    ctx.format.name if ctx.format else None, str(stream.time_base),
+                    hashlib.sha256(ctx.extradata).hexdigest())
+    
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_data_hash", "sha256",
+        "-show_entries", "stream=codec_name,profile,width,height,pix_fmt,time_base,extradata_hash",
+        "-of", "json",
+        video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    stream = json.loads(result.stdout)["streams"][0]
+    if not stream.get("extradata_hash"):
+        raise ValueError(f"No codec extradata in {video_path}")
+    return tuple(stream.get(key) for key in ("codec_name", "profile", "width", "height",
+                                             "pix_fmt", "time_base", "extradata_hash"))
+
+
+def concatenate_videos(video_files, output_path, hwenc=None, target_duration=None):
     """
     Concatenate multiple video files.
     
+    If every file has the same codec parameters the streams are copied;
+    otherwise (or if the copy fails) the output is re-encoded.
+    
     Args:
         video_files: List of video file paths
         output_path: Path for concatenated output
+        hwenc: Hardware encoder name (None = libx264)
+        target_duration: Cut the output to this many seconds (None = full length)
     """
-    # Create concat file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-        concat_file = f.name
-        for video in video_files:
-            abs_path = os.path.abspath(video)
-            # Escape single quotes for FFmpeg
-            escaped_path = abs_path.replace("'", "'\\''")
-            f.write(f"file '{escaped_path}'\n")
+    # Build the concat list (resolve relative paths against one getcwd call)
+    cwd = os.getcwd()
+    lines = []
+    for video in video_files:
+        abs_path = video if os.path.isabs(video) else os.path.join(cwd, video)
+        # Escape single quotes for FFmpeg
+        escaped_path = abs_path.replace("'", "'\\''")
+        lines.append(f"file '{escaped_path}'\n")
+    concat_list = "".join(lines).encode()
+    
+    output_args = ["-an"]  # No audio yet
+    if target_duration is not None:
+        output_args += ["-t", str(target_duration)]
+    output_args += ["-y", output_path]
+    
+    # Feed the list to the concat demuxer on stdin instead of a temp file
+    input_args = [
+        "-f", "concat",
+        "-safe", "0",
+        "-protocol_whitelist", "file,pipe",
+        "-i", "pipe:0",
+    ]
     
     try:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            params = set(executor.map(video_stream_params, video_files))
+    except (subprocess.CalledProcessError, OSError, IndexError, KeyError, ValueError):
+        params = None  # Can't compare the clips, so re-encode
+    
+    if params is not None and len(params) == 1:
+        # Regenerate timestamps so small gaps at the joins don't break the copy
         cmd = [
             "ffmpeg",
-            "-f", "concat",
-            "-safe", "0",
-            "-i", concat_file,
-            "-c:v", "libx264",
-            "-preset", "medium",
-            "-crf", "23",
-            "-an",  # No audio yet
-            "-y",
-            output_path
+            "-fflags", "+genpts",
+            *input_args,
+            "-c", "copy",
+            "-avoid_negative_ts", "make_zero",
+            *output_args,
         ]
         
-        subprocess.run(cmd, capture_output=True, check=True)
-    finally:
-        os.unlink(concat_file)
+        try:
+            subprocess.run(cmd, input=concat_list, capture_output=True, check=True)
+            return
+        except subprocess.CalledProcessError:
+            pass  # Fall back to re-encoding below
+    
+    # Only reached on a real mismatch; these clips are intermediates, so
+    # favour speed when encoding in software
+    cmd = [
+        "ffmpeg",
+        *input_args,
+        *video_codec_args(hwenc, preset="veryfast"),
+        *output_args,
+    ]
+    
+    subprocess.run(cmd, input=concat_list, capture_output=True, check=True)
+
+
+def render_scenes(scene_inputs, output_path, hwenc=None, target_duration=None, audio_path=None):
+    """
+    Trim and concatenate scenes in a single ffmpeg pass.
+    
+    Each scene is opened as its own input and seeked to its offset, and the
+    concat filter joins them, so every frame is encoded exactly once and no
+    intermediate trimmed files are written. With audio_path the music is
+    muxed in the same pass, producing the final video directly.
+    
+    Args:
+        scene_inputs: List of (scene_path, duration, start_offset) tuples
+        output_path: Path for concatenated output
+        hwenc: Hardware encoder name (None = libx264)
+        target_duration: Cut the output to this many seconds (None = full length)
+        audio_path: Audio file to add as AAC (None = silent output)
+    """
+    cmd = ["ffmpeg"]
+    filters = []
+    
+    for i, (scene_path, duration, start_offset) in enumerate(scene_inputs):
+        cmd += ["-ss", str(start_offset), "-t", str(duration), "-i", scene_path]
+        filters.append(f"[{i}:v]setpts=PTS-STARTPTS[v{i}]")
+    
+    concat_inputs = "".join(f"[v{i}]" for i in range(len(scene_inputs)))
+    concat_filter = f"{concat_inputs}concat=n={len(scene_inputs)}:v=1:a=0"
+    
+    # Hardware encoders that need frames uploaded get it at the end of the graph
+    upload_filter = HW_ENCODERS[hwenc].get("filter") if hwenc else None
+    if upload_filter:
+        concat_filter += f",{upload_filter}"
+    filters.append(f"{concat_filter}[outv]")
+    
+    if audio_path:
+        cmd += ["-i", audio_path]
+    
+    cmd += [
+        "-filter_complex", ";".join(filters),
+        "-map", "[outv]",
+        *video_codec_args(hwenc, use_filter=False),
+    ]
+    
+    if audio_path:
+        cmd += [
+            "-map", f"{len(scene_inputs)}:a:0",  # Audio from the last input
+            "-c:a", "aac",
+            "-b:a", "192k",
+            "-shortest",
+            "-movflags", "+faststart",
+        ]
+    else:
+        cmd += ["-an"]  # No audio yet
+    
+    if target_duration is not None:
+        cmd += ["-t", str(target_duration)]
+    
+    cmd += ["-y", output_path]
+    
+    subprocess.run(cmd, capture_output=True, check=True)
+
+
+def _remux_with_pyav(video_path, audio_path, output_path):
+    """
+    Mux video and AAC audio into an MP4 by copying packets in-process.
+    
+    Audio packets past the end of the video are dropped (like -shortest).
+    
+    Returns:
+        True if muxed, False if the audio isn't AAC and needs transcoding
+    """
+    with av.open(video_path) as video_in, av.open(audio_path) as audio_in:
+        video_stream = video_in.streams.video[0]
+        audio_stream = audio_in.streams.audio[0]
+        
+        if audio_stream.codec_context.name != "aac":
+            return False
+        
+        video_end = video_in.duration / av.time_base if video_in.duration is not None else None
+        
+        with av.open(output_path, "w", format="mp4", options={"movflags": "+faststart"}) as output:
+            out_video = output.add_stream_from_template(video_stream)
+            out_audio = output.add_stream_from_template(audio_stream)
+            
+            def packets(container, stream, out_stream):
+                for packet in container.demux(stream):
+                    if packet.dts is None:
+                        continue  # Flush packet at end of stream
+                    packet.stream = out_stream
+                    yield packet
+            
+            # Interleave both streams in timestamp order
+            merged = heapq.merge(packets(video_in, video_stream, out_video),
+                                 packets(audio_in, audio_stream, out_audio),
+                                 key=lambda packet: packet.dts * packet.time_base)
+            
+            for packet in merged:
+                if (packet.stream is out_audio and video_end is not None
+                        and packet.pts * packet.time_base >= video_end):
+                    continue
+                output.mux(packet)
+    
+    return True
 
 
 def add_audio(video_path, audio_path, output_path):
     """
     Add audio track to video.
     
-    Trims video to match audio duration if needed.
+    The video is expected to already be cut to the final length (see
+    assemble_video), so it is always stream-copied and never re-encoded.
+    AAC audio is muxed in-process with PyAV when available; otherwise
+    ffmpeg copies the video and transcodes the audio to AAC.
     
     Args:
         video_path: Path to silent video
         audio_path: Path to audio file
         output_path: Path for final output
     """
-    # Get audio duration
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        audio_path
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    audio_duration = float(result.stdout.strip())
+    if av is not None and hasattr(av.container.OutputContainer, "add_stream_from_template"):
+        if _remux_with_pyav(video_path, audio_path, output_path):
+            return
     
-    # Get video duration
     cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        video_path
+        "ffmpeg",
+        "-i", video_path,
+        "-i", audio_path,
+        "-map", "0:v:0",  # Video from first input
+        "-map", "1:a:0",  # Audio from second input
+        "-c:v", "copy",   # Copy video
+        "-c:a", "aac",    # Encode audio as AAC for MP4
+        "-b:a", "192k",   # Audio bitrate
+        "-shortest",      # Stop at shortest stream
+        "-movflags", "+faststart",  # Put the index first for streaming playback
+        "-avoid_negative_ts", "make_zero",
+        "-y",
+        output_path
     ]
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    video_duration = float(result.stdout.strip())
-    
-    # If video is longer than audio, we need to trim it during encoding
-    if video_duration > audio_duration + 0.1:
-        print(f"  Trimming video from {video_duration:.2f}s to {audio_duration:.2f}s")
-        cmd = [
-            "ffmpeg",
-            "-i", video_path,
-            "-i", audio_path,
-            "-map", "0:v:0",  # Video from first input
-            "-map", "1:a:0",  # Audio from second input
-            "-t", str(audio_duration),  # Trim to audio duration
-            "-c:v", "libx264",  # Must re-encode to trim
-            "-preset", "fast",
-            "-crf", "23",
-            "-c:a", "aac",    # Encode audio as AAC for MP4
-            "-b:a", "192k",   # Audio bitrate
-            "-y",
-            output_path
-        ]
-    else:
-        # Video is equal or shorter, can use copy
-        cmd = [
-            "ffmpeg",
-            "-i", video_path,
-            "-i", audio_path,
-            "-map", "0:v:0",  # Video from first input
-            "-map", "1:a:0",  # Audio from second input
-            "-c:v", "copy",   # Copy video
-            "-c:a", "aac",    # Encode audio as AAC for MP4
-            "-b:a", "192k",   # Audio bitrate
-            "-shortest",      # Stop at shortest stream
-            "-y",
-            output_path
-        ]
     
     subprocess.run(cmd, capture_output=True, check=True)
 
 
-def assemble_video(scenes_dir, plan_file, audio_file, output_file="output.mp4"):
+def assemble_video(scenes_dir, plan_file, audio_file, output_file="output.mp4", hwenc=None,
+                   audio_duration=None):
     """
     Main assembly function.
     
     Args:
         scenes_dir: Directory containing scene clips
-        plan_file: Scene alignment plan file
+        plan_file: Scene alignment plan file, or an already loaded plan
+                   (list of dicts as returned by load_scene_plan)
         audio_file: Audio/music file to add
         output_file: Final output video file
+        hwenc: Hardware encoder name from HW_ENCODERS (None = libx264)
+        audio_duration: Length of the audio in seconds if already known
+                        (None = probe audio_file)
+    
+    Returns:
+        Duration of the final video in seconds
     """
     print("🎬 Bounce - Final Video Assembly")
     print("=" * 70)
     
+    encoder_name = HW_ENCODERS[hwenc]["codec"] if hwenc else "libx264"
+    print(f"\n⚙️  Video encoder: {encoder_name}")
+    
     # Load the scene plan
-    print(f"\n📋 Loading scene plan from: {plan_file}")
-    scenes = load_scene_plan(plan_file)
+    if isinstance(plan_file, (str, os.PathLike)):
+        print(f"\n📋 Loading scene plan from: {plan_file}")
+        scenes = load_scene_plan(plan_file)
+    else:
+        scenes = list(plan_file)
     print(f"✓ Loaded plan for {len(scenes)} scenes")
     
-    # Create temporary directory for trimmed scenes
+    # Decide the final length up front: render the video at exactly that
+    # length so the audio can be added without re-encoding the video
+    if audio_duration is None:
+        audio_duration = get_media_duration(audio_file)
+    planned_duration = sum(scene['trim_to'] for scene in scenes)
+    target_duration = min(planned_duration, audio_duration)
+    
+    if planned_duration > audio_duration + 0.1:
+        print(f"  Trimming video from {planned_duration:.2f}s to {audio_duration:.2f}s to match audio")
+    
+    # Create temporary directory for intermediate video files
     with tempfile.TemporaryDirectory() as temp_dir:
         print(f"\n✂️  Trimming scenes to align with measures...")
         
         trimmed_files = []
+        trim_tasks = []
+        report = []  # Buffered and printed once, not once per scene
         
         for i, scene in enumerate(scenes, 1):
             scene_path = os.path.join(scenes_dir, scene['file'])
@@ -233,58 +447,75 @@ def assemble_video(scenes_dir, plan_file, audio_file, output_file="output.mp4"):
             part_info = f" (part {scene['part']}/{scene['total_parts']})" if scene['total_parts'] > 1 else ""
             offset_info = f" from {scene['start_offset']:.2f}s" if scene['start_offset'] > 0 else ""
             
-            print(f"  Scene {i:2d}: {scene['file']}{part_info}{offset_info} - "
-                  f"{scene['original_duration']:.2f}s → {scene['trim_to']:.2f}s")
+            report.append(f"  Scene {i:2d}: {scene['file']}{part_info}{offset_info} - "
+                          f"{scene['original_duration']:.2f}s → {scene['trim_to']:.2f}s")
             
-            spinner = Spinner(f"    Trimming scene {i}/{len(scenes)}...")
+            trim_tasks.append((scene_path, scene['trim_to'], trimmed_path, scene['start_offset'], hwenc))
+            trimmed_files.append(trimmed_path)
+        
+        print("\n".join(report))
+        
+        if len(trim_tasks) <= MAX_FILTER_GRAPH_INPUTS:
+            # Trim, concatenate and add the music in one ffmpeg run (single
+            # encode pass, no intermediate video file)
+            print(f"🎵 Adding audio track: {audio_file}")
+            
+            spinner = Spinner(f"    Trimming and concatenating {len(trim_tasks)} scenes with audio...")
             spinner.start()
             
-            trim_scene(scene_path, scene['trim_to'], trimmed_path, scene['start_offset'])
+            try:
+                render_scenes([(path, duration, offset) for path, duration, _, offset, _ in trim_tasks],
+                              output_file, hwenc, target_duration, audio_file)
+            finally:
+                spinner.stop()
+            
+            print(f"✓ Trimmed, concatenated and added audio to {len(trim_tasks)} scenes in a single pass")
+        else:
+            # Too many inputs to open at once: trim each scene, then concatenate
+            # Each trim is independent, so run several ffmpeg encodes at once
+            max_workers = encode_workers(len(trim_tasks), hwenc)
+            
+            spinner = Spinner(f"    Trimming {len(trim_tasks)} scenes ({max_workers} at a time)...")
+            spinner.start()
+            
+            try:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    list(executor.map(lambda task: trim_scene(*task), trim_tasks))
+            finally:
+                spinner.stop()
+            
+            print(f"✓ Trimmed {len(trimmed_files)} scenes")
+            
+            # Concatenate all trimmed scenes
+            print(f"\n🎞️  Concatenating trimmed scenes...")
+            concatenated_path = os.path.join(temp_dir, "concatenated.mp4")
+            
+            spinner = Spinner("Concatenating video files...")
+            spinner.start()
+            
+            concatenate_videos(trimmed_files, concatenated_path, hwenc, target_duration)
             
             spinner.stop()
             
-            trimmed_files.append(trimmed_path)
-        
-        print(f"✓ Trimmed {len(trimmed_files)} scenes")
-        
-        # Concatenate all trimmed scenes
-        print(f"\n🎞️  Concatenating trimmed scenes...")
-        
-        spinner = Spinner("Concatenating video files...")
-        spinner.start()
-        
-        concatenated_path = os.path.join(temp_dir, "concatenated.mp4")
-        concatenate_videos(trimmed_files, concatenated_path)
-        
-        spinner.stop()
-        
-        print(f"✓ Concatenated into single video")
-        
-        # Add audio track
-        print(f"\n🎵 Adding audio track: {audio_file}")
-        
-        spinner = Spinner("Encoding final video with audio...")
-        spinner.start()
-        
-        add_audio(concatenated_path, audio_file, output_file)
-        
-        spinner.stop()
-        
-        print(f"✓ Added audio track")
+            print(f"✓ Concatenated into single video")
+            
+            # Add audio track
+            print(f"\n🎵 Adding audio track: {audio_file}")
+            
+            spinner = Spinner("Encoding final video with audio...")
+            spinner.start()
+            
+            add_audio(concatenated_path, audio_file, output_file)
+            
+            spinner.stop()
+            
+            print(f"✓ Added audio track")
     
     # Get final file info
     file_size = os.path.getsize(output_file) / (1024 * 1024)
     
     # Get duration
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        output_file
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    duration = float(result.stdout.strip())
+    duration = get_media_duration(output_file)
     
     print("\n" + "=" * 70)
     print("✅ SUCCESS! Final video created!")
@@ -297,25 +528,44 @@ def assemble_video(scenes_dir, plan_file, audio_file, output_file="output.mp4"):
     print("\n🎉 Your beat-synchronized music video is ready!")
     print(f"\nThe video contains {len(scenes)} scenes, each trimmed to align")
     print(f"with musical measure boundaries for perfect synchronization.")
+    
+    return duration
 
 
 def main():
-    if len(sys.argv) < 4:
-        print("Usage: python assemble_video.py <scenes_dir> <plan_file> <audio_file> [output_file]")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    
+    if len(args) < 3:
+        print("Usage: python assemble_video.py <scenes_dir> <plan_file> <audio_file> [output_file] [--hwenc=ENCODER]")
         print("\nArguments:")
         print("  scenes_dir  - Directory containing scene MP4 files")
         print("  plan_file   - Scene alignment plan (from align_scenes.py)")
         print("  audio_file  - Audio/music file to add to the video")
         print("  output_file - Output video file (default: output.mp4)")
+        print("\nOptions:")
+        print("  --hwenc=ENCODER - Video encoder: nvenc, qsv, vt, vaapi, or none for libx264")
+        print("                    (default: auto-detect a working hardware encoder)")
         print("\nExample:")
         print("  python assemble_video.py scenes scene_plan.txt example/mp3/Example.mp3")
         print("  python assemble_video.py scenes scene_plan.txt example/mp3/Example.mp3 final_video.mp4")
+        print("  python assemble_video.py scenes scene_plan.txt example/mp3/Example.mp3 --hwenc=none")
         sys.exit(1)
     
-    scenes_dir = sys.argv[1]
-    plan_file = sys.argv[2]
-    audio_file = sys.argv[3]
-    output_file = sys.argv[4] if len(sys.argv) > 4 else "output.mp4"
+    scenes_dir = args[0]
+    plan_file = args[1]
+    audio_file = args[2]
+    output_file = args[3] if len(args) > 3 else "output.mp4"
+    hwenc = "auto"
+    
+    for arg in sys.argv[1:]:
+        if arg.startswith("--hwenc="):
+            hwenc = arg.split("=")[1]
+    
+    try:
+        hwenc = resolve_hwenc(hwenc)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
     
     # Validate inputs
     if not os.path.exists(scenes_dir):
@@ -331,7 +581,7 @@ def main():
         sys.exit(1)
     
     try:
-        assemble_video(scenes_dir, plan_file, audio_file, output_file)
+        assemble_video(scenes_dir, plan_file, audio_file, output_file, hwenc)
     except subprocess.CalledProcessError as e:
         print(f"\n❌ FFmpeg Error: {e}")
         print("Check that FFmpeg is installed and the input files are valid.")
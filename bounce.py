@@ -6,52 +6,86 @@ Main CLI that orchestrates all steps to create a music video.
 
 import sys
 import os
+import argparse
 import subprocess
 import tempfile
 import shutil
 import threading
-import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from media import HW_ENCODERS, resolve_hwenc
 
 
-class Spinner:
-    """A simple spinner to show progress during long operations."""
-    
-    def __init__(self, message="Processing"):
-        self.message = message
-        self.running = False
-        self.thread = None
-        self.frames = ["⠋", "⠙", "⠹", "⠸", "⠼", "⠴", "⠦", "⠧", "⠇", "⠏"]
-        self.frame_index = 0
-    
-    def _spin(self):
-        """Run the spinner animation."""
-        while self.running:
-            frame = self.frames[self.frame_index % len(self.frames)]
-            sys.stderr.write(f"\r{frame} {self.message}")
-            sys.stderr.flush()
-            self.frame_index += 1
-            time.sleep(0.1)
-    
-    def start(self):
-        """Start the spinner."""
-        if not sys.stderr.isatty():
-            # Don't show spinner if not in a terminal
-            return
-        self.running = True
-        self.thread = threading.Thread(target=self._spin)
-        self.thread.daemon = True
-        self.thread.start()
-    
-    def stop(self):
-        """Stop the spinner and clear the line."""
-        if not self.running:
-            return
-        self.running = False
-        if self.thread:
-            self.thread.join()
-        sys.stderr.write("\r" + " " * (len(self.message) + 3) + "\r")
-        sys.stderr.flush()
+def print_step_header(step_name, description):
+    """Print the banner shown at the start of each processing step."""
+    print(f"\n{'='*70}")
+    print(f"Step: {step_name}")
+    print(f"{'='*70}")
+    print(f"{description}\n")
+
+
+class ThreadBufferedOutput:
+    """
+    Stand-in for sys.stdout that holds each registered thread's output in
+    its own buffer, so concurrent steps don't interleave their reports.
+    Writes from other threads pass straight through.
+    """
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffers = {}
+    
+    def write(self, text):
+        buffer = self.buffers.get(threading.get_ident())
+        if buffer is None:
+            return self.stream.write(text)
+        buffer.append(text)
+        return len(text)
+    
+    def flush(self):
+        self.stream.flush()
+    
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def run_concurrently(*funcs):
+    """
+    Run independent steps on separate threads and wait for all of them.
+    
+    The first step prints live; the others' console output is buffered and
+    printed in argument order once everything has finished, so the reports
+    don't interleave.
+    
+    Returns:
+        List of the functions' return values, in argument order
+    """
+    output = ThreadBufferedOutput(sys.stdout)
+    outputs = {}
+    
+    def run_buffered(func):
+        buffer = output.buffers[threading.get_ident()] = []
+        try:
+            return func()
+        finally:
+            del output.buffers[threading.get_ident()]
+            outputs[func] = "".join(buffer)
+    
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=len(funcs)) as executor:
+            futures = [executor.submit(funcs[0])]
+            futures += [executor.submit(run_buffered, func) for func in funcs[1:]]
+            for future in futures:
+                future.exception()  # Wait for every step before reporting
+    finally:
+        sys.stdout = output.stream
+        for func in funcs[1:]:
+            sys.stdout.write(outputs.get(func, ""))
+        sys.stdout.flush()
+    
+    return [future.result() for future in futures]
 
 
 def run_step(step_name, command, description):
@@ -63,99 +97,246 @@ def run_step(step_name, command, description):
         command: Command to run (list of arguments)
         description: Description of what the step does
     """
-    print(f"\n{'='*70}")
-    print(f"Step: {step_name}")
-    print(f"{'='*70}")
-    print(f"{description}\n")
-    
-    # Start spinner while subprocess runs
-    spinner = Spinner(f"{step_name}...")
-    spinner.start()
+    print_step_header(step_name, description)
+    sys.stdout.flush()
     
-    result = subprocess.run(command, capture_output=True, text=True)
+    # The step writes its report straight to our stdout as it runs. stderr is
+    # relayed chunk by chunk (keeping progress bars intact) and its tail kept
+    # for the error message
+    proc = subprocess.Popen(command, stderr=subprocess.PIPE)
+    stderr_tail = deque(maxlen=64)
     
-    spinner.stop()
+    for chunk in iter(lambda: proc.stderr.read1(4096), b""):
+        sys.stderr.buffer.write(chunk)
+        sys.stderr.buffer.flush()
+        stderr_tail.append(chunk)
     
-    # Print output
-    if result.stdout:
-        print(result.stdout)
+    proc.stderr.close()
+    returncode = proc.wait()
     
-    if result.returncode != 0:
+    if returncode != 0:
         print(f"\n❌ Error in {step_name}")
-        if result.stderr:
-            print(result.stderr)
-        raise RuntimeError(f"{step_name} failed with exit code {result.returncode}")
+        last_lines = b"".join(stderr_tail).decode(errors="replace").strip().splitlines()
+        detail = f": {last_lines[-1]}" if last_lines else ""
+        raise RuntimeError(f"{step_name} failed with exit code {returncode}{detail}")
+    
+    return returncode
+
+
+def run_pipeline(audio_file, video_file, output_file, work_dir, scene_threshold,
+                 beats_per_measure, max_scene_measures, skip_boring_seconds, hwenc=None):
+    """
+    Run all steps in this process, passing results between steps in memory.
+    
+    Avoids starting a Python interpreter (and re-importing librosa/numpy) per
+    step and the text-file round trips between steps. Scene splitting and
+    assembly both encode with hwenc (None = libx264).
+    
+    Returns:
+        Duration of the output video in seconds
+    """
+    # Imported here so --subprocess runs don't pay for loading librosa
+    import detect_beats
+    import filter_beats
+    import detect_scenes
+    import align_scenes
+    import assemble_video
+    
+    scenes_dir = os.path.join(work_dir, "scenes")
+    
+    # Step 0 (Optional): Detect boring segments
+    if skip_boring_seconds:
+        import detect_boring_segments
+        
+        print_step_header(
+            "0. Boring Segment Detection",
+            f"Detecting segments where upper half is static for >{skip_boring_seconds}s..."
+        )
+        detect_boring_segments.find_boring_segments(video_file, skip_boring_seconds, 0.01, work_dir)
     
-    return result
+    def audio_steps():
+        # Step 1: Detect beats
+        print_step_header("1. Beat Detection", "Analyzing audio to detect beats...")
+        # Decode the song once; every audio analysis works from this array
+        y, sr = detect_beats.load_audio(audio_file)
+        beat_times = detect_beats.detect_beats_from_array(y, sr)
+        
+        # Step 2: Filter to measures
+        print_step_header("2. Measure Filtering", f"Filtering beats to measures ({beats_per_measure}/4 time)...")
+        measures = filter_beats.filter_measures(beat_times, None, beats_per_measure)
+        
+        # The decoded song gives its length, so assembly needn't probe the file
+        return measures, len(y) / sr
+    
+    def video_steps():
+        # Step 3: Detect scenes
+        print_step_header("3. Scene Detection", "Detecting scene changes in video...")
+        return detect_scenes.detect_scenes(video_file, scenes_dir, scene_threshold, hwenc)
+    
+    # Audio analysis and scene detection don't depend on each other, so run
+    # them side by side (the beat tracker is NumPy-bound, scene detection
+    # mostly waits on ffmpeg)
+    print("\n⏱️  Running beat detection and scene detection in parallel...")
+    (measures, audio_duration), scene_files = run_concurrently(audio_steps, video_steps)
+    
+    if not scene_files:
+        raise RuntimeError("Scene detection did not create any scene clips")
+    
+    # Step 4: Align scenes to measures
+    print_step_header("4. Scene Alignment", "Aligning scenes to measure timestamps...")
+    # The scene clips live in work_dir and are deleted afterwards, so caching
+    # their durations on disk could never pay off
+    scene_table = align_scenes.align_scenes_to_measures(scenes_dir, measures, None, max_scene_measures,
+                                                        use_cache=False)
+    
+    # Step 5: Assemble final video
+    print_step_header("5. Video Assembly", "Assembling final beat-synchronized video...")
+    return assemble_video.assemble_video(scenes_dir, scene_table.to_plan(), audio_file, output_file,
+                                         hwenc, audio_duration)
+
+
+def run_pipeline_subprocess(audio_file, video_file, output_file, work_dir, scene_threshold,
+                            beats_per_measure, max_scene_measures, skip_boring_seconds,
+                            text_intermediates=False, hwenc=None):
+    """
+    Run each step as a separate script, passing results through files in work_dir.
+    
+    Intermediates are binary (.npy arrays, pickled scene plan) unless
+    text_intermediates is set, in which case the readable .txt files are used.
+    Scene splitting and assembly both encode with hwenc (None = libx264).
+    """
+    # Define file paths
+    if text_intermediates:
+        beats_file = os.path.join(work_dir, "beats.txt")
+        measures_file = os.path.join(work_dir, "measures.txt")
+        scene_plan_file = os.path.join(work_dir, "scene_plan.txt")
+    else:
+        beats_file = os.path.join(work_dir, "beats.npy")
+        measures_file = os.path.join(work_dir, "measures.npy")
+        scene_plan_file = os.path.join(work_dir, "scene_plan.pkl")
+    scenes_dir = os.path.join(work_dir, "scenes")
+    interesting_segments_file = None
+    hwenc_arg = f"--hwenc={hwenc or 'none'}"
+    
+    # Step 0 (Optional): Detect boring segments
+    if skip_boring_seconds:
+        interesting_segments_file = os.path.join(work_dir, "interesting_segments.txt")
+        
+        run_step(
+            "0. Boring Segment Detection",
+            ["python3", "detect_boring_segments.py", video_file, str(skip_boring_seconds), "0.01"],
+            f"Detecting segments where upper half is static for >{skip_boring_seconds}s..."
+        )
+        
+        # Move the output files to work_dir
+        if os.path.exists("interesting_segments.txt"):
+            shutil.move("interesting_segments.txt", interesting_segments_file)
+        if os.path.exists("boring_segments.txt"):
+            shutil.move("boring_segments.txt", os.path.join(work_dir, "boring_segments.txt"))
+    
+    # Step 1: Detect beats
+    run_step(
+        "1. Beat Detection",
+        ["python3", "detect_beats.py", audio_file, beats_file],
+        "Analyzing audio to detect beats..."
+    )
+    
+    # Step 2: Filter to measures
+    run_step(
+        "2. Measure Filtering",
+        ["python3", "filter_beats.py", beats_file, measures_file, str(beats_per_measure)],
+        f"Filtering beats to measures ({beats_per_measure}/4 time)..."
+    )
+    
+    # Step 3: Detect scenes
+    run_step(
+        "3. Scene Detection",
+        ["python3", "detect_scenes.py", video_file, scenes_dir, str(scene_threshold), hwenc_arg],
+        "Detecting scene changes in video..."
+    )
+    
+    # Step 4: Align scenes to measures
+    align_cmd = ["python3", "align_scenes.py", scenes_dir, measures_file, scene_plan_file]
+    if max_scene_measures:
+        align_cmd.append(str(max_scene_measures))
+    align_cmd.append("--no-cache")  # Scene clips in work_dir are deleted afterwards
+    
+    run_step(
+        "4. Scene Alignment",
+        align_cmd,
+        "Aligning scenes to measure timestamps..."
+    )
+    
+    # Step 5: Assemble final video
+    run_step(
+        "5. Video Assembly",
+        ["python3", "assemble_video.py", scenes_dir, scene_plan_file, audio_file, output_file, hwenc_arg],
+        "Assembling final beat-synchronized video..."
+    )
 
 
 def main():
     """Main CLI entry point."""
     
-    if len(sys.argv) < 3:
-        print("Bounce - Beat-Synchronized Music Video Creator")
-        print("=" * 70)
-        print("\nUsage: python bounce.py <audio_file> <video_file> [output_file] [options]")
-        print("\nArguments:")
-        print("  audio_file  - MP3 audio file (the music)")
-        print("  video_file  - MP4 video file (the footage)")
-        print("  output_file - Output video file (default: output.mp4)")
-        print("\nOptions:")
-        print("  --scene-threshold=N      - Scene detection sensitivity 0.0-1.0 (default: 0.3)")
-        print("                             Lower = more sensitive, detects more scenes")
-        print("  --beats-per-measure=N    - Beats per measure (default: 4 for 4/4 time)")
-        print("  --max-scene-measures=N   - Maximum scene length in measures (default: no limit)")
-        print("                             Long scenes will be split into chunks")
-        print("  --skip-boring=N          - Skip boring segments (upper half static for N seconds)")
-        print("                             Useful for motorcycle videos, removes straight-line sections")
-        print("\nExamples:")
-        print("  python bounce.py song.mp3 video.mp4")
-        print("  python bounce.py song.mp3 video.mp4 result.mp4")
-        print("  python bounce.py song.mp3 video.mp4 result.mp4 --scene-threshold=0.2")
-        print("  python bounce.py song.mp3 video.mp4 result.mp4 --max-scene-measures=16")
-        print("  python bounce.py song.mp3 video.mp4 result.mp4 --skip-boring=10")
-        print("\nWhat it does:")
-        print("  1. Detects beats in the audio")
-        print("  2. Filters beats to measures (downbeats)")
-        print("  3. Detects scene changes in the video")
-        print("  4. Aligns scenes to measure timestamps")
-        print("  5. Assembles final beat-synchronized video")
-        print("\n" + "=" * 70)
+    parser = argparse.ArgumentParser(
+        prog="bounce.py",
+        description="Bounce - Beat-Synchronized Music Video Creator",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""examples:
+  python bounce.py song.mp3 video.mp4
+  python bounce.py song.mp3 video.mp4 result.mp4
+  python bounce.py song.mp3 video.mp4 result.mp4 --scene-threshold=0.2
+  python bounce.py song.mp3 video.mp4 result.mp4 --max-scene-measures=16
+  python bounce.py song.mp3 video.mp4 result.mp4 --skip-boring=10
+  python bounce.py song.mp3 video.mp4 result.mp4 --hwenc=none
+
+what it does:
+  1. Detects beats in the audio
+  2. Filters beats to measures (downbeats)
+  3. Detects scene changes in the video
+  4. Aligns scenes to measure timestamps
+  5. Assembles final beat-synchronized video""",
+    )
+    parser.add_argument("audio_file", help="MP3 audio file (the music)")
+    parser.add_argument("video_file", help="MP4 video file (the footage)")
+    parser.add_argument("output_file", nargs="?", default="output.mp4",
+                        help="Output video file (default: output.mp4)")
+    parser.add_argument("--scene-threshold", type=float, default=0.3, metavar="N",
+                        help="Scene detection sensitivity 0.0-1.0 (default: 0.3). "
+                             "Lower = more sensitive, detects more scenes")
+    parser.add_argument("--beats-per-measure", type=int, default=4, metavar="N",
+                        help="Beats per measure (default: 4 for 4/4 time)")
+    parser.add_argument("--max-scene-measures", type=int, default=None, metavar="N",
+                        help="Maximum scene length in measures (default: no limit). "
+                             "Long scenes will be split into chunks")
+    parser.add_argument("--skip-boring", type=float, default=None, metavar="N",
+                        help="Skip boring segments (upper half static for N seconds). "
+                             "Useful for motorcycle videos, removes straight-line sections")
+    parser.add_argument("--hwenc", choices=["auto", *HW_ENCODERS, "none"], default="auto",
+                        help="Video encoder for scene clips and the final video "
+                             "(default: auto-detect a working hardware encoder, "
+                             "none = libx264)")
+    parser.add_argument("--subprocess", action="store_true",
+                        help="Run each step as a separate script (slower, for debugging)")
+    parser.add_argument("--text", action="store_true",
+                        help="With --subprocess, pass results between steps as .txt files")
+    
+    if len(sys.argv) < 2:
+        parser.print_help()
         sys.exit(1)
     
-    # Parse arguments
-    audio_file = sys.argv[1]
-    video_file = sys.argv[2]
-    output_file = "output.mp4"
-    scene_threshold = 0.3
-    beats_per_measure = 4
-    max_scene_measures = None
-    skip_boring_seconds = None
-    
-    # Parse optional arguments
-    for arg in sys.argv[3:]:
-        if arg.startswith("--scene-threshold="):
-            try:
-                scene_threshold = float(arg.split("=")[1])
-            except ValueError:
-                print("⚠ Warning: Invalid scene threshold, using default 0.3")
-        elif arg.startswith("--beats-per-measure="):
-            try:
-                beats_per_measure = int(arg.split("=")[1])
-            except ValueError:
-                print("⚠ Warning: Invalid beats per measure, using default 4")
-        elif arg.startswith("--max-scene-measures="):
-            try:
-                max_scene_measures = int(arg.split("=")[1])
-            except ValueError:
-                print("⚠ Warning: Invalid max scene measures, ignoring")
-        elif arg.startswith("--skip-boring="):
-            try:
-                skip_boring_seconds = float(arg.split("=")[1])
-            except ValueError:
-                print("⚠ Warning: Invalid skip boring seconds, ignoring")
-        elif not arg.startswith("--"):
-            output_file = arg
+    # Intermixed parsing lets the output path come after options, as before
+    args = parser.parse_intermixed_args()
+    audio_file = args.audio_file
+    video_file = args.video_file
+    output_file = args.output_file
+    scene_threshold = args.scene_threshold
+    beats_per_measure = args.beats_per_measure
+    max_scene_measures = args.max_scene_measures
+    skip_boring_seconds = args.skip_boring
+    use_subprocess = args.subprocess
+    text_intermediates = args.text
+    hwenc = args.hwenc
     
     # Validate inputs
     if not os.path.exists(audio_file):
@@ -184,72 +365,26 @@ def main():
     else:
         print(f"  Skip boring segments: disabled")
     
+    # Look for a hardware encoder once; scene splitting and assembly share it
+    hwenc = resolve_hwenc(hwenc)
+    if hwenc:
+        print(f"  Video encoder:        {HW_ENCODERS[hwenc]['codec']} (hardware)")
+    else:
+        print(f"  Video encoder:        libx264")
+    
     # Create working directory for temporary files
     work_dir = tempfile.mkdtemp(prefix="bounce_")
     print(f"\nWorking directory: {work_dir}")
     
     try:
-        # Define file paths
-        beats_file = os.path.join(work_dir, "beats.txt")
-        measures_file = os.path.join(work_dir, "measures.txt")
-        scenes_dir = os.path.join(work_dir, "scenes")
-        scene_plan_file = os.path.join(work_dir, "scene_plan.txt")
-        interesting_segments_file = None
-        
-        # Step 0 (Optional): Detect boring segments
-        if skip_boring_seconds:
-            interesting_segments_file = os.path.join(work_dir, "interesting_segments.txt")
-            
-            run_step(
-                "0. Boring Segment Detection",
-                ["python3", "detect_boring_segments.py", video_file, str(skip_boring_seconds), "0.01"],
-                f"Detecting segments where upper half is static for >{skip_boring_seconds}s..."
-            )
-            
-            # Move the output files to work_dir
-            if os.path.exists("interesting_segments.txt"):
-                shutil.move("interesting_segments.txt", interesting_segments_file)
-            if os.path.exists("boring_segments.txt"):
-                shutil.move("boring_segments.txt", os.path.join(work_dir, "boring_segments.txt"))
-        
-        # Step 1: Detect beats
-        run_step(
-            "1. Beat Detection",
-            ["python3", "detect_beats.py", audio_file, beats_file],
-            "Analyzing audio to detect beats..."
-        )
-        
-        # Step 2: Filter to measures
-        run_step(
-            "2. Measure Filtering",
-            ["python3", "filter_beats.py", beats_file, measures_file, str(beats_per_measure)],
-            f"Filtering beats to measures ({beats_per_measure}/4 time)..."
-        )
-        
-        # Step 3: Detect scenes
-        run_step(
-            "3. Scene Detection",
-            ["python3", "detect_scenes.py", video_file, scenes_dir, str(scene_threshold)],
-            "Detecting scene changes in video..."
-        )
-        
-        # Step 4: Align scenes to measures
-        align_cmd = ["python3", "align_scenes.py", scenes_dir, measures_file, scene_plan_file]
-        if max_scene_measures:
-            align_cmd.append(str(max_scene_measures))
-        
-        run_step(
-            "4. Scene Alignment",
-            align_cmd,
-            "Aligning scenes to measure timestamps..."
-        )
-        
-        # Step 5: Assemble final video
-        run_step(
-            "5. Video Assembly",
-            ["python3", "assemble_video.py", scenes_dir, scene_plan_file, audio_file, output_file],
-            "Assembling final beat-synchronized video..."
-        )
+        duration = None
+        if use_subprocess:
+            run_pipeline_subprocess(audio_file, video_file, output_file, work_dir, scene_threshold,
+                                    beats_per_measure, max_scene_measures, skip_boring_seconds,
+                                    text_intermediates, hwenc)
+        else:
+            duration = run_pipeline(audio_file, video_file, output_file, work_dir, scene_threshold,
+                                    beats_per_measure, max_scene_measures, skip_boring_seconds, hwenc)
         
         print("\n" + "=" * 70)
         print("🎉 SUCCESS! Your beat-synchronized music video is ready!")
@@ -261,12 +396,14 @@ def main():
             size_mb = os.path.getsize(output_file) / (1024 * 1024)
             print(f"📊 File size:   {size_mb:.2f} MB")
             
-            # Get duration
-            cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-                   "-of", "default=noprint_wrappers=1:nokey=1", output_file]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
-                duration = float(result.stdout.strip())
+            # Get duration (already known when assembly ran in this process)
+            if duration is None:
+                cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+                       "-of", "default=noprint_wrappers=1:nokey=1", output_file]
+                result = subprocess.run(cmd, capture_output=True, text=True)
+                if result.returncode == 0:
+                    duration = float(result.stdout.strip())
+            if duration is not None:
                 print(f"⏱️  Duration:    {duration:.2f} seconds")
         
         print("\n" + "=" * 70)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Shared Cache Utility
+On-disk cache location and helpers shared by the pipeline steps.
+"""
+
+import os
+import glob
+import tempfile
+
+
+# Decoded audio, probed durations, etc. are cached here between runs
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "bounce")
+
+
+def atomic_write(path, write, mode='wb'):
+    """
+    Write a cache file atomically, so an interrupted run can't leave a
+    partial or corrupt file behind.
+    
+    The data goes to a temporary file next to `path`, which then replaces
+    it in one step; on failure the temporary file is removed.
+    
+    Args:
+        path: Destination file path
+        write: Callable taking the open file object and writing the data
+        mode: File mode for the temporary file ('wb' or 'w')
+    
+    Raises:
+        OSError: If the file could not be written
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    f = tempfile.NamedTemporaryFile(mode, dir=directory, suffix='.tmp', delete=False)
+    try:
+        with f:
+            write(f)
+        os.replace(f.name, path)
+    except BaseException:
+        try:
+            os.unlink(f.name)
+        except OSError:
+            pass
+        raise
+
+
+def prune_cache(pattern, keep):
+    """
+    Delete all but the `keep` most recently used cache files matching a pattern.
+    
+    Args:
+        pattern: Glob pattern relative to CACHE_DIR (e.g. 'audio_*.npy')
+        keep: Number of files to keep, newest modification time first
+    """
+    paths = glob.glob(os.path.join(CACHE_DIR, pattern))
+    if len(paths) <= keep:
+        return
+    
+    def mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0.0
+    
+    for path in sorted(paths, key=mtime, reverse=True)[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # Already gone, or in use by another run
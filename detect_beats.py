@@ -5,39 +5,132 @@ Detects beats in an audio file and outputs timestamps to a text file.
 """
 
 import sys
+import os
+import hashlib
+import importlib.util
 import librosa
 import numpy as np
 from spinner import Spinner
+from cache import CACHE_DIR, atomic_write, prune_cache
 
 
-def detect_beats(audio_file, output_file="beats.txt"):
+# Sample rate used for beat analysis. Half of librosa's 22050 Hz default:
+# onset energy for beat tracking lives well below 5 kHz, and with HOP_LENGTH
+# 512 this gives ~46 ms frames (vs ~23 ms), which halves the STFT/spectral
+# flux work. Beat positions are still far finer than a video frame matters
+# for measure-level cuts at 60-180 BPM.
+ANALYSIS_SAMPLE_RATE = 11025
+
+# Hop between onset envelope frames
+HOP_LENGTH = 512
+
+# Resampler for decoding. soxr's quick mode runs in C and is several times
+# faster than its high-quality mode (and far faster than librosa's old
+# kaiser_best default); its slightly wider transition band is irrelevant
+# for onset/beat analysis
+RESAMPLE_TYPE = 'soxr_qq'
+
+# madmom's beat networks are trained on 44.1 kHz input
+MADMOM_SAMPLE_RATE = 44100
+
+# aubio's window for tempo tracking (two hops)
+AUBIO_WINDOW_SIZE = 1024
+
+BEAT_BACKENDS = ("librosa", "aubio", "madmom")
+
+# aubio's tracker is native C and much faster than librosa's, so prefer it.
+# Only check that it is installed: the optional backends are imported when
+# used, so a run on another backend never pays for (or trips over) them
+DEFAULT_BACKEND = "aubio" if importlib.util.find_spec("aubio") is not None else "librosa"
+
+# Decoded audio is cached so re-runs on the same song skip the MP3 decode.
+# Only the most recently used songs are kept (~10 MB per 4-minute song)
+AUDIO_CACHE_MAX_FILES = 16
+
+
+def _audio_cache_path(audio_file, sr):
+    """Build the cache file path for an audio file from its content, size, mtime and sample rate."""
+    st = os.stat(audio_file)
+    digest = hashlib.blake2b(digest_size=8)
+    with open(audio_file, 'rb') as f:
+        digest.update(f.read(1 << 20))
+    digest.update(f"{st.st_size}|{st.st_mtime_ns}|{sr}".encode())
+    return os.path.join(CACHE_DIR, f"audio_{digest.hexdigest()}.npy")
+
+
+def _save_audio_cache(cache_path, y):
+    """Save decoded audio to the cache and drop the least recently used entries."""
+    try:
+        atomic_write(cache_path, lambda f: np.save(f, y.astype(np.float32, copy=False)))
+    except OSError as e:
+        print(f"⚠ Warning: Could not save audio cache: {e}")
+        return
+    prune_cache("audio_*.npy", AUDIO_CACHE_MAX_FILES)
+
+
+def load_audio(audio_file, sr=ANALYSIS_SAMPLE_RATE):
     """
-    Detect beats in an audio file and save timestamps to a text file.
+    Decode an audio file to a mono float array for analysis.
+    
+    Decoding is the most expensive part of beat detection, so callers that run
+    several analyses on the same file should load it once and reuse the array.
+    Decoded samples are also cached on disk and memory-mapped on later runs.
     
     Args:
         audio_file: Path to audio file (MP3, WAV, etc.)
-        output_file: Path to output text file for beat timestamps
+        sr: Sample rate to resample to
     
     Returns:
-        Array of beat times in seconds
+        Tuple of (samples, sample_rate)
     """
     print(f"Loading audio file: {audio_file}")
     
-    # Load the audio file
-    y, sr = librosa.load(audio_file)
+    cache_path = _audio_cache_path(audio_file, sr)
+    
+    try:
+        y = np.load(cache_path, mmap_mode='r')
+        os.utime(cache_path)  # Mark as recently used so pruning keeps it
+        print(f"✓ Audio loaded from cache: {len(y) / sr:.2f} seconds, sample rate: {sr} Hz")
+        return y, sr
+    except (OSError, ValueError):
+        pass
+    
+    # Decode at the native rate and mix down before resampling, so only one
+    # channel goes through the resampler and the mix needs no new buffer
+    y, native_sr = librosa.load(audio_file, sr=None, mono=False, dtype=np.float32)
+    if y.ndim > 1:
+        mono = y[0]
+        for channel in y[1:]:
+            mono += channel
+        mono *= 1.0 / len(y)
+        y = mono
+    
+    if native_sr != sr:
+        y = librosa.resample(y, orig_sr=native_sr, target_sr=sr, res_type=RESAMPLE_TYPE)
+    _save_audio_cache(cache_path, y)
     
     print(f"✓ Audio loaded: {len(y) / sr:.2f} seconds, sample rate: {sr} Hz")
     
-    # Detect beats
-    spinner = Spinner("Detecting beats...")
-    spinner.start()
+    return y, sr
+
+
+def _track_beats_librosa(y, sr):
+    """
+    Track beats with librosa's dynamic-programming tracker.
     
-    tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
+    The onset envelope is computed once up front and handed to beat_track, so
+    the STFT is not redone inside the tracker.
     
-    spinner.stop()
+    Returns:
+        Tuple of (tempo_bpm, beat_times)
+    """
+    onset_env = librosa.onset.onset_strength(y=y, sr=sr, hop_length=HOP_LENGTH, aggregate=np.median)
+    tempo, beat_frames = librosa.beat.beat_track(
+        onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH, trim=False
+    )
     
     # Convert beat frames to time in seconds
-    beat_times = librosa.frames_to_time(beat_frames, sr=sr)
+    beat_times = librosa.frames_to_time(beat_frames, sr=sr, hop_length=HOP_LENGTH)
     
     # Handle tempo (can be array or scalar)
     if isinstance(tempo, np.ndarray):
@@ -45,6 +138,114 @@ def detect_beats(audio_file, output_file="beats.txt"):
     else:
         tempo = float(tempo)
     
+    return tempo, beat_times
+
+
+def _track_beats_aubio(y, sr):
+    """
+    Track beats with aubio's native tempo tracker, fed hop by hop.
+    
+    Returns:
+        Tuple of (tempo_bpm, beat_times)
+    """
+    try:
+        import aubio
+    except ImportError:
+        raise RuntimeError("The aubio backend requires aubio (pip install aubio)")
+    
+    tracker = aubio.tempo("default", AUBIO_WINDOW_SIZE, HOP_LENGTH, int(sr))
+    
+    # aubio wants float32 blocks of exactly one hop; zero-pad the final one
+    samples = np.asarray(y, dtype=np.float32)
+    padded = np.zeros(-(-len(samples) // HOP_LENGTH) * HOP_LENGTH, dtype=np.float32)
+    padded[:len(samples)] = samples
+    
+    beat_times = []
+    for block in padded.reshape(-1, HOP_LENGTH):
+        if tracker(block)[0]:
+            beat_times.append(tracker.get_last_s())
+    
+    return float(tracker.get_bpm()), np.asarray(beat_times, dtype=np.float64)
+
+
+def _track_beats_madmom(y, sr):
+    """
+    Track beats with madmom's RNN beat activations and DBN decoder.
+    
+    Returns:
+        Tuple of (tempo_bpm, beat_times)
+    """
+    try:
+        import madmom.audio.signal
+        from madmom.features.beats import RNNBeatProcessor, DBNBeatTrackingProcessor
+    except ImportError:
+        raise RuntimeError("The madmom backend requires madmom (pip install madmom)")
+    except AttributeError as e:
+        # madmom 0.16.1 (the latest release) uses np.int, removed in NumPy 1.24
+        raise RuntimeError(f"madmom could not be imported with this NumPy version: {e}")
+    
+    if sr != MADMOM_SAMPLE_RATE:
+        y = librosa.resample(np.asarray(y), orig_sr=sr, target_sr=MADMOM_SAMPLE_RATE, res_type=RESAMPLE_TYPE)
+    
+    signal = madmom.audio.signal.Signal(y, sample_rate=MADMOM_SAMPLE_RATE)
+    activations = RNNBeatProcessor()(signal)
+    beat_times = DBNBeatTrackingProcessor(fps=100)(activations)
+    
+    # madmom doesn't report a tempo, so derive it from the median beat interval
+    tempo = 60.0 / float(np.median(np.diff(beat_times))) if len(beat_times) > 1 else 0.0
+    
+    return tempo, beat_times
+
+
+def detect_beats(audio_file, output_file="beats.txt", backend=DEFAULT_BACKEND):
+    """
+    Detect beats in an audio file and save timestamps to a text file.
+    
+    Args:
+        audio_file: Path to audio file (MP3, WAV, etc.)
+        output_file: Path to output file for beat timestamps (None = don't save).
+                     A .npy path saves a binary float64 array instead of text.
+        backend: Beat tracker to use ("librosa", "aubio" or "madmom")
+    
+    Returns:
+        Array of beat times in seconds
+    """
+    # madmom needs full-band audio, so don't decode at the reduced analysis rate
+    y, sr = load_audio(audio_file, MADMOM_SAMPLE_RATE if backend == "madmom" else ANALYSIS_SAMPLE_RATE)
+    return detect_beats_from_array(y, sr, output_file, source=audio_file, backend=backend)
+
+
+def detect_beats_from_array(y, sr, output_file=None, source=None, backend=DEFAULT_BACKEND):
+    """
+    Detect beats in already-decoded audio.
+    
+    Args:
+        y: Mono audio samples
+        sr: Sample rate of y
+        output_file: Path to output text file for beat timestamps (None = don't save)
+        source: Audio file name recorded in the output header
+        backend: Beat tracker to use ("librosa", "aubio" or "madmom")
+    
+    Returns:
+        Array of beat times in seconds
+    """
+    if backend not in BEAT_BACKENDS:
+        raise ValueError(f"Unknown beat backend: {backend} (choose from {', '.join(BEAT_BACKENDS)})")
+    
+    # Detect beats
+    spinner = Spinner(f"Detecting beats ({backend})...")
+    spinner.start()
+    
+    try:
+        if backend == "madmom":
+            tempo, beat_times = _track_beats_madmom(y, sr)
+        elif backend == "aubio":
+            tempo, beat_times = _track_beats_aubio(y, sr)
+        else:
+            tempo, beat_times = _track_beats_librosa(y, sr)
+    finally:
+        spinner.stop()
+    
     print(f"✓ Detected {len(beat_times)} beats")
     print(f"✓ Estimated tempo: {tempo:.1f} BPM")
     
@@ -55,18 +256,24 @@ def detect_beats(audio_file, output_file="beats.txt"):
         calculated_bpm = 60.0 / avg_interval
         print(f"✓ Calculated BPM from intervals: {calculated_bpm:.1f}")
     
-    # Save beat times to text file
-    print(f"\nSaving beat timestamps to: {output_file}")
-    with open(output_file, 'w') as f:
-        f.write(f"# Beat timestamps for: {audio_file}\n")
-        f.write(f"# Detected {len(beat_times)} beats at {tempo:.1f} BPM\n")
-        f.write(f"# Format: beat_number, timestamp_seconds\n")
-        f.write("#\n")
+    # Save beat times (binary .npy is exact and needs no parsing downstream)
+    if output_file and str(output_file).endswith('.npy'):
+        print(f"\nSaving beat timestamps to: {output_file}")
+        np.save(output_file, np.asarray(beat_times, dtype=np.float64))
+        print(f"✓ Saved {len(beat_times)} beat timestamps")
+    elif output_file:
+        print(f"\nSaving beat timestamps to: {output_file}")
+        header = (
+            f"# Beat timestamps for: {source or 'audio array'}\n"
+            f"# Detected {len(beat_times)} beats at {tempo:.1f} BPM\n"
+            f"# Format: beat_number, timestamp_seconds\n"
+            "#"
+        )
+        beat_numbers = np.arange(1, len(beat_times) + 1)
+        np.savetxt(output_file, np.column_stack([beat_numbers, beat_times]),
+                   fmt=['%d', '%.6f'], delimiter=', ', header=header, comments='')
         
-        for i, beat_time in enumerate(beat_times, 1):
-            f.write(f"{i}, {beat_time:.6f}\n")
-    
-    print(f"✓ Saved {len(beat_times)} beat timestamps")
+        print(f"✓ Saved {len(beat_times)} beat timestamps")
     
     # Print first 10 beats
     print("\nFirst 10 beats:")
@@ -80,18 +287,28 @@ def detect_beats(audio_file, output_file="beats.txt"):
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python detect_beats.py <audio_file> [output_file]")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = [arg for arg in sys.argv[1:] if arg.startswith("--")]
+    
+    if len(args) < 1:
+        print("Usage: python detect_beats.py <audio_file> [output_file] [--backend=librosa|aubio|madmom]")
+        print(f"\nDefault backend: {DEFAULT_BACKEND} (aubio when installed, otherwise librosa)")
         print("\nExample:")
         print("  python detect_beats.py example/mp3/Example.mp3")
         print("  python detect_beats.py example/mp3/Example.mp3 my_beats.txt")
+        print("  python detect_beats.py example/mp3/Example.mp3 my_beats.txt --backend=madmom")
         sys.exit(1)
     
-    audio_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else "beats.txt"
+    audio_file = args[0]
+    output_file = args[1] if len(args) > 1 else "beats.txt"
+    backend = DEFAULT_BACKEND
+    
+    for option in options:
+        if option.startswith("--backend="):
+            backend = option.split("=", 1)[1]
     
     try:
-        beat_times = detect_beats(audio_file, output_file)
+        beat_times = detect_beats(audio_file, output_file, backend)
         print(f"\n✅ Success! Beat detection complete.")
     except Exception as e:
         print(f"\n❌ Error: {e}")
@@ -8,13 +8,78 @@ Useful for removing long straight-line sections in motorcycle videos.
 import sys
 import os
 import subprocess
-import json
-import tempfile
+import threading
 from pathlib import Path
+import numpy as np
 from spinner import Spinner
+from media import get_media_duration, parse_metadata_log
 
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
 
-def analyze_upper_half_changes(video_path, window_seconds=5.0, threshold=0.02):
+
+def find_static_windows(times, mafd, window_seconds, threshold):
+    """
+    Find stretches where the rolling mean frame difference stays below threshold.
+    
+    Args:
+        times: Frame timestamps in seconds (ascending)
+        mafd: Mean absolute frame difference per frame (0-100)
+        window_seconds: Rolling window length (seconds)
+        threshold: Change threshold (0.0-1.0), compared against mafd / 100
+    
+    Returns:
+        List of (start_time, end_time) tuples for boring segments
+    """
+    if len(times) == 0:
+        return []
+    
+    # Rolling mean over the window ending at each frame, via prefix sums
+    cumsum = np.concatenate(([0.0], np.cumsum(mafd)))
+    idx = np.arange(len(times))
+    window_start = np.searchsorted(times, times - window_seconds, side='left')
+    rolling_mean = (cumsum[idx + 1] - cumsum[window_start]) / (idx + 1 - window_start)
+    
+    # A frame is boring if the full window ending at it is below threshold
+    full_window = times - times[0] >= window_seconds
+    boring = full_window & (rolling_mean < threshold * 100)
+    if not boring.any():
+        return []
+    
+    # Merge the overlapping [t - window, t] intervals into segments
+    ends = times[boring]
+    starts = ends - window_seconds
+    breaks = np.flatnonzero(starts[1:] > ends[:-1]) + 1
+    seg_starts = starts[np.concatenate(([0], breaks))]
+    seg_ends = ends[np.concatenate((breaks - 1, [len(ends) - 1]))]
+    
+    # A window can straddle the edge of a static stretch, so trim each
+    # segment to its first and last frame that is itself below threshold
+    # (every segment has one, since its windows average below threshold)
+    still = np.flatnonzero(mafd < threshold * 100)
+    first = still[np.searchsorted(still, np.searchsorted(times, seg_starts, side='left'))]
+    last = still[np.searchsorted(still, np.searchsorted(times, seg_ends, side='right')) - 1]
+    
+    return list(zip(times[first].tolist(), times[last].tolist()))
+
+
+def _report_progress(progress_lines, bar):
+    """Advance a tqdm bar (in seconds) from ffmpeg -progress key=value lines."""
+    done = 0.0
+    for line in progress_lines:
+        if line.startswith('out_time_us='):
+            try:
+                position = int(line.split('=', 1)[1]) / 1_000_000
+            except ValueError:
+                continue  # N/A before the first frame
+            if position > done:
+                bar.update(position - done)
+                done = position
+
+
+def analyze_upper_half_changes(video_path, window_seconds=5.0, threshold=0.02, duration=None):
     """
     Analyze video to find boring segments (minimal change in upper half).
     
@@ -22,6 +87,7 @@ def analyze_upper_half_changes(video_path, window_seconds=5.0, threshold=0.02):
         video_path: Path to video file
         window_seconds: Time window to analyze for changes (seconds)
         threshold: Change threshold (0.0-1.0, lower=more sensitive)
+        duration: Video duration in seconds, used as the progress bar total
     
     Returns:
         List of (start_time, end_time) tuples for boring segments
@@ -30,72 +96,50 @@ def analyze_upper_half_changes(video_path, window_seconds=5.0, threshold=0.02):
     print(f"  Window size: {window_seconds}s")
     print(f"  Threshold: {threshold}")
     
-    # Create temp directory for analysis
-    with tempfile.TemporaryDirectory() as temp_dir:
-        stats_file = os.path.join(temp_dir, "stats.log")
-        
-        # Use FFmpeg to analyze scene changes in the upper half only
-        # We'll crop to upper half and use freezedetect filter
-        cmd = [
-            "ffmpeg",
-            "-i", video_path,
-            "-vf", f"crop=iw:ih/2:0:0,freezedetect=n={threshold}:d={window_seconds}",
-            "-f", "null",
-            "-"
-        ]
-        
-        spinner = Spinner("Analyzing video (this may take a while)...")
-        spinner.start()
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        spinner.stop()
-        
-        # Parse freeze detection output from stderr (ffmpeg outputs to stderr)
-        boring_segments = []
-        lines = result.stderr.split('\n')
-        
-        freeze_start = None
-        for line in lines:
-            if 'lavfi.freezedetect.freeze_start' in line:
-                # Extract start time
-                try:
-                    parts = line.split('lavfi.freezedetect.freeze_start:')
-                    if len(parts) > 1:
-                        freeze_start = float(parts[1].strip())
-                except (ValueError, IndexError):
-                    continue
-            
-            elif 'lavfi.freezedetect.freeze_end' in line and freeze_start is not None:
-                # Extract end time
-                try:
-                    parts = line.split('lavfi.freezedetect.freeze_end:')
-                    if len(parts) > 1:
-                        freeze_end = float(parts[1].strip())
-                        duration = freeze_end - freeze_start
-                        
-                        # Only include if duration is significant
-                        if duration >= window_seconds:
-                            boring_segments.append((freeze_start, freeze_end))
-                        
-                        freeze_start = None
-                except (ValueError, IndexError):
-                    continue
-        
-        return boring_segments
-
-
-def get_video_duration(video_path):
-    """Get video duration in seconds."""
+    # Crop to the upper half and shrink it to 160x90 so the frame difference
+    # works on a tiny image; scdet tags every frame with its mean absolute
+    # difference from the previous one, which the metadata filter prints
     cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        video_path
+        "ffmpeg",
+        "-i", video_path,
+        "-an",
+        "-vf", f"crop=iw:ih/2:0:0,scale=160:90,scdet=threshold={threshold * 100},"
+               "metadata=print:key=lavfi.scd.mafd",
+        "-progress", "pipe:1",
+        "-nostats",
+        "-f", "null",
+        "-"
     ]
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    return float(result.stdout.strip())
+    
+    # Parse frame differences from stderr (ffmpeg outputs to stderr) as it is
+    # written, rather than buffering the whole log until ffmpeg exits
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True, bufsize=1)
+    
+    # Show real progress from ffmpeg's -progress output when tqdm is installed
+    if tqdm is not None:
+        bar = tqdm(total=round(duration, 2) if duration else None, unit="s", desc="Analyzing video")
+        reader = threading.Thread(target=_report_progress, args=(proc.stdout, bar), daemon=True)
+    else:
+        spinner = Spinner("Analyzing video (this may take a while)...")
+        reader = threading.Thread(target=proc.stdout.read, daemon=True)  # Just drain it
+        spinner.start()
+    reader.start()
+    
+    try:
+        frames = parse_metadata_log(proc.stderr, 'lavfi.scd.mafd')
+    finally:
+        proc.stderr.close()
+        proc.wait()
+        reader.join()
+        proc.stdout.close()
+        if tqdm is not None:
+            bar.close()
+        else:
+            spinner.stop()
+    
+    times, mafd = np.array(frames, dtype=float).reshape(-1, 2).T
+    return find_static_windows(times, mafd, window_seconds, threshold)
 
 
 def create_interesting_segments(video_duration, boring_segments):
@@ -113,20 +157,16 @@ def create_interesting_segments(video_duration, boring_segments):
         # No boring segments, entire video is interesting
         return [(0.0, video_duration)]
     
-    interesting = []
-    current_pos = 0.0
-    
-    for start, end in sorted(boring_segments):
-        # Add the interesting part before this boring segment
-        if start > current_pos + 1.0:  # At least 1 second of interesting content
-            interesting.append((current_pos, start))
-        current_pos = end
+    # Interesting parts are the gaps between boring segments, plus the
+    # stretches before the first and after the last one
+    boring = np.asarray(sorted(boring_segments), dtype=float)
+    starts = np.concatenate(([0.0], boring[:, 1]))
+    ends = np.concatenate((boring[:, 0], [video_duration]))
     
-    # Add remaining interesting part after last boring segment
-    if current_pos < video_duration - 1.0:
-        interesting.append((current_pos, video_duration))
+    # Keep gaps with at least 1 second of interesting content
+    keep = (ends - starts) > 1.0
     
-    return interesting
+    return list(zip(starts[keep].tolist(), ends[keep].tolist()))
 
 
 def save_segments(segments, output_file, segment_type="interesting"):
@@ -141,6 +181,71 @@ def save_segments(segments, output_file, segment_type="interesting"):
             f.write(f"{start:.6f}, {end:.6f}, {duration:.6f}\n")
 
 
+def find_boring_segments(video_file, window_seconds=5.0, threshold=0.02, output_prefix=""):
+    """
+    Find boring and interesting segments of a video and save them to files.
+    
+    Args:
+        video_file: Input video file
+        window_seconds: Minimum duration to consider boring (seconds)
+        threshold: Change sensitivity (0.0-1.0, lower=more sensitive)
+        output_prefix: Directory for the output files (default: current directory)
+    
+    Returns:
+        (boring_segments, interesting_segments) lists of (start, end) tuples
+    """
+    # Get video duration
+    video_duration = get_media_duration(video_file)
+    print(f"Video duration: {video_duration:.2f}s")
+    
+    # Detect boring segments
+    boring_segments = analyze_upper_half_changes(video_file, window_seconds, threshold, video_duration)
+    
+    # Calculate statistics
+    total_boring = sum(end - start for start, end in boring_segments)
+    boring_percent = (total_boring / video_duration * 100) if video_duration > 0 else 0
+    
+    print("\n" + "=" * 70)
+    print("Results:")
+    print("=" * 70)
+    print(f"Boring segments found:  {len(boring_segments)}")
+    print(f"Total boring time:      {total_boring:.2f}s ({boring_percent:.1f}%)")
+    print(f"Interesting time:       {video_duration - total_boring:.2f}s ({100 - boring_percent:.1f}%)")
+    
+    if boring_segments:
+        print("\nBoring segments:")
+        for i, (start, end) in enumerate(boring_segments, 1):
+            duration = end - start
+            print(f"  Segment {i:2d}: {start:7.2f}s - {end:7.2f}s ({duration:6.2f}s)")
+    else:
+        print("\n✨ No boring segments detected - video is all interesting!")
+    
+    # Create interesting segments
+    interesting_segments = create_interesting_segments(video_duration, boring_segments)
+    
+    print(f"\nInteresting segments:   {len(interesting_segments)}")
+    for i, (start, end) in enumerate(interesting_segments, 1):
+        duration = end - start
+        print(f"  Segment {i:2d}: {start:7.2f}s - {end:7.2f}s ({duration:6.2f}s)")
+    
+    # Save results
+    boring_output = os.path.join(output_prefix, "boring_segments.txt") if output_prefix else "boring_segments.txt"
+    interesting_output = os.path.join(output_prefix, "interesting_segments.txt") if output_prefix else "interesting_segments.txt"
+    
+    save_segments(boring_segments, boring_output, "boring")
+    save_segments(interesting_segments, interesting_output, "interesting")
+    
+    print("\n" + "=" * 70)
+    print("✅ Segment detection complete!")
+    print("=" * 70)
+    print("\nOutput files:")
+    print(f"  {boring_output}")
+    print(f"  {interesting_output}")
+    print("\n" + "=" * 70)
+    
+    return boring_segments, interesting_segments
+
+
 def main():
     if len(sys.argv) < 2:
         print("Detect Boring Segments - Find unchanged upper half sections")
@@ -182,54 +287,7 @@ def main():
     print(f"\nAnalyzing upper half of frame for static content...")
     
     try:
-        # Get video duration
-        video_duration = get_video_duration(video_file)
-        print(f"Video duration: {video_duration:.2f}s")
-        
-        # Detect boring segments
-        boring_segments = analyze_upper_half_changes(video_file, window_seconds, threshold)
-        
-        # Calculate statistics
-        total_boring = sum(end - start for start, end in boring_segments)
-        boring_percent = (total_boring / video_duration * 100) if video_duration > 0 else 0
-        
-        print("\n" + "=" * 70)
-        print("Results:")
-        print("=" * 70)
-        print(f"Boring segments found:  {len(boring_segments)}")
-        print(f"Total boring time:      {total_boring:.2f}s ({boring_percent:.1f}%)")
-        print(f"Interesting time:       {video_duration - total_boring:.2f}s ({100 - boring_percent:.1f}%)")
-        
-        if boring_segments:
-            print("\nBoring segments:")
-            for i, (start, end) in enumerate(boring_segments, 1):
-                duration = end - start
-                print(f"  Segment {i:2d}: {start:7.2f}s - {end:7.2f}s ({duration:6.2f}s)")
-        else:
-            print("\n✨ No boring segments detected - video is all interesting!")
-        
-        # Create interesting segments
-        interesting_segments = create_interesting_segments(video_duration, boring_segments)
-        
-        print(f"\nInteresting segments:   {len(interesting_segments)}")
-        for i, (start, end) in enumerate(interesting_segments, 1):
-            duration = end - start
-            print(f"  Segment {i:2d}: {start:7.2f}s - {end:7.2f}s ({duration:6.2f}s)")
-        
-        # Save results
-        boring_output = os.path.join(output_prefix, "boring_segments.txt") if output_prefix else "boring_segments.txt"
-        interesting_output = os.path.join(output_prefix, "interesting_segments.txt") if output_prefix else "interesting_segments.txt"
-        
-        save_segments(boring_segments, boring_output, "boring")
-        save_segments(interesting_segments, interesting_output, "interesting")
-        
-        print("\n" + "=" * 70)
-        print("✅ Segment detection complete!")
-        print("=" * 70)
-        print("\nOutput files:")
-        print(f"  {boring_output}")
-        print(f"  {interesting_output}")
-        print("\n" + "=" * 70)
+        find_boring_segments(video_file, window_seconds, threshold, output_prefix)
         
     except Exception as e:
         print(f"\n❌ Error: {e}")
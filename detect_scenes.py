@@ -7,24 +7,19 @@ Detects scene changes in a video and splits it into separate silent MP4 clips.
 import sys
 import os
 import subprocess
-import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from spinner import Spinner
+from media import video_codec_args, encode_workers, resolve_hwenc, get_media_duration, parse_metadata_log
 
 
-def get_duration(video_file):
-    """Get duration of a video file in seconds."""
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "json",
-        video_file
-    ]
-    
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    data = json.loads(result.stdout)
-    return float(data["format"]["duration"])
+def scene_times_above(scores, threshold):
+    """Return the sorted scene change times (always starting at 0) whose score exceeds threshold."""
+    scene_times = {0.0}  # Always start at 0
+    for scene_time, score in scores:
+        if score > threshold and scene_time > 0.1:  # Ignore very early detections
+            scene_times.add(scene_time)
+    return sorted(scene_times)
 
 
 def detect_scene_changes(video_file, threshold=0.3):
@@ -32,6 +27,10 @@ def detect_scene_changes(video_file, threshold=0.3):
     Detect scene changes in a video file using FFmpeg's scene detection.
     The scene filter calculates the difference between consecutive frames.
     
+    The video is decoded once: frames are selected at the most sensitive
+    threshold that might be needed, and the stricter thresholds are then
+    applied to the recorded scores without re-running ffmpeg.
+    
     Args:
         video_file: Path to video file
         threshold: Scene detection threshold (0.0-1.0, lower=more sensitive)
@@ -45,17 +44,22 @@ def detect_scene_changes(video_file, threshold=0.3):
     print("  (Lower = more sensitive to changes)")
     
     # Get video duration
-    duration = get_duration(video_file)
+    duration = get_media_duration(video_file)
     print(f"✓ Video duration: {duration:.2f} seconds")
     
     print("\nDetecting scene changes (this may take a while)...")
     
-    # Use ffmpeg's scene filter with showinfo to get pts_time values
-    # The select filter only passes frames where scene > threshold
+    # Fallback thresholds used when too few scenes are found
+    lower_threshold = threshold * 0.6
+    sensitive_threshold = 0.15
+    min_threshold = min(threshold, lower_threshold, sensitive_threshold)
+    
+    # The select filter only passes frames where scene > min_threshold and
+    # tags them with their score, which the metadata filter prints
     cmd = [
         "ffmpeg",
         "-i", video_file,
-        "-vf", f"select='gt(scene,{threshold})',showinfo",
+        "-vf", f"select='gt(scene,{min_threshold})',metadata=print:key=lavfi.scene_score",
         "-vsync", "vfr",
         "-f", "null",
         "-"
@@ -68,106 +72,27 @@ def detect_scene_changes(video_file, threshold=0.3):
     
     spinner.stop()
     
-    # Parse scene change times from showinfo output (in stderr)
-    scene_times = [0.0]  # Always start at 0
-    
-    for line in result.stderr.split('\n'):
-        # Look for showinfo lines with pts_time
-        if 'Parsed_showinfo' in line and 'pts_time:' in line:
-            try:
-                # Extract pts_time value
-                # Format: ... pts_time:146.112633 ...
-                parts = line.split('pts_time:')
-                if len(parts) > 1:
-                    time_str = parts[1].split()[0]
-                    scene_time = float(time_str)
-                    if scene_time > 0.1:  # Ignore very early detections
-                        scene_times.append(scene_time)
-            except (ValueError, IndexError):
-                continue
-    
-    # Remove duplicates and sort
-    scene_times = sorted(set(scene_times))
+    scores = parse_metadata_log(result.stderr.splitlines(), 'lavfi.scene_score')
+    scene_times = scene_times_above(scores, threshold)
     
     print(f"✓ Initial detection: {len(scene_times)} scene changes")
     
     # If very few scenes detected, try with lower threshold
     if len(scene_times) <= 3:
-        print(f"\n  Few scenes detected, trying with lower threshold ({threshold * 0.6:.2f})...")
-        lower_threshold = threshold * 0.6
-        
-        cmd = [
-            "ffmpeg",
-            "-i", video_file,
-            "-vf", f"select='gt(scene,{lower_threshold})',showinfo",
-            "-vsync", "vfr",
-            "-f", "null",
-            "-"
-        ]
-        
-        spinner = Spinner("Re-analyzing with lower threshold...")
-        spinner.start()
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        spinner.stop()
-        
-        scene_times = [0.0]
-        for line in result.stderr.split('\n'):
-            if 'Parsed_showinfo' in line and 'pts_time:' in line:
-                try:
-                    parts = line.split('pts_time:')
-                    if len(parts) > 1:
-                        time_str = parts[1].split()[0]
-                        scene_time = float(time_str)
-                        if scene_time > 0.1:
-                            scene_times.append(scene_time)
-                except (ValueError, IndexError):
-                    continue
-        
-        scene_times = sorted(set(scene_times))
+        print(f"\n  Few scenes detected, trying with lower threshold ({lower_threshold:.2f})...")
+        scene_times = scene_times_above(scores, lower_threshold)
         print(f"  ✓ With lower threshold: {len(scene_times)} scene changes")
     
     # If still too few, try an even more aggressive threshold
     if len(scene_times) <= 3:
-        print(f"\n  Still few scenes, trying very sensitive threshold (0.15)...")
-        
-        cmd = [
-            "ffmpeg",
-            "-i", video_file,
-            "-vf", "select='gt(scene,0.15)',showinfo",
-            "-vsync", "vfr",
-            "-f", "null",
-            "-"
-        ]
-        
-        spinner = Spinner("Re-analyzing with very sensitive threshold...")
-        spinner.start()
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        spinner.stop()
-        
-        scene_times = [0.0]
-        for line in result.stderr.split('\n'):
-            if 'Parsed_showinfo' in line and 'pts_time:' in line:
-                try:
-                    parts = line.split('pts_time:')
-                    if len(parts) > 1:
-                        time_str = parts[1].split()[0]
-                        scene_time = float(time_str)
-                        if scene_time > 0.1:
-                            scene_times.append(scene_time)
-                except (ValueError, IndexError):
-                    continue
-        
-        scene_times = sorted(set(scene_times))
+        print(f"\n  Still few scenes, trying very sensitive threshold ({sensitive_threshold})...")
+        scene_times = scene_times_above(scores, sensitive_threshold)
         print(f"  ✓ With very sensitive threshold: {len(scene_times)} scene changes")
     
     return scene_times, duration
 
 
-def split_video_into_scenes(video_file, scene_times, duration, output_dir):
+def split_video_into_scenes(video_file, scene_times, duration, output_dir, hwenc=None):
     """
     Split video into separate clips at scene change points.
     
@@ -176,6 +101,7 @@ def split_video_into_scenes(video_file, scene_times, duration, output_dir):
         scene_times: List of scene change timestamps
         duration: Total video duration
         output_dir: Directory to save scene clips
+        hwenc: Hardware encoder name (see media.HW_ENCODERS, None = libx264)
     
     Returns:
         List of paths to created scene clip files
@@ -186,7 +112,7 @@ def split_video_into_scenes(video_file, scene_times, duration, output_dir):
     print(f"\nSplitting video into {len(scene_times)} scenes...")
     print(f"Output directory: {output_dir}")
     
-    scene_files = []
+    tasks = []
     
     for i in range(len(scene_times)):
         start_time = scene_times[i]
@@ -201,89 +127,150 @@ def split_video_into_scenes(video_file, scene_times, duration, output_dir):
         scene_file = os.path.join(output_dir, f"scene_{i+1:04d}.mp4")
         
         print(f"  Creating scene {i+1}: {start_time:.2f}s - {end_time:.2f}s ({scene_duration:.2f}s)")
+        tasks.append((i + 1, start_time, scene_duration, scene_file))
+    
+    def extract_scene(task):
+        scene_number, start_time, scene_duration, scene_file = task
         
-        # Extract scene with no audio
-        cmd = [
-            "ffmpeg",
-            "-i", video_file,
-            "-ss", str(start_time),
-            "-t", str(scene_duration),
-            "-c:v", "libx264",
-            "-preset", "fast",
-            "-crf", "23",
-            "-an",  # Remove audio
-            "-avoid_negative_ts", "1",
-            "-y",
-            scene_file
-        ]
-        
-        spinner = Spinner(f"    Extracting scene {i+1}/{len(scene_times)}...")
-        spinner.start()
+        # The hardware check is a one-frame test encode, so a real scene can
+        # still fail on it (unusual format, session limit); redo it in
+        # software then, rather than dropping the footage
+        attempts = [hwenc, None] if hwenc else [None]
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        for encoder in attempts:
+            # Extract scene with no audio. Seeking before -i jumps straight to the
+            # scene instead of decoding everything before it (still frame-accurate
+            # because the clip is re-encoded)
+            cmd = [
+                "ffmpeg",
+                "-ss", str(start_time),
+                "-i", video_file,
+                "-t", str(scene_duration),
+                *video_codec_args(encoder, preset="fast"),
+                "-an",  # Remove audio
+                "-avoid_negative_ts", "1",
+                "-y",
+                scene_file
+            ]
+            
+            if subprocess.run(cmd, capture_output=True).returncode == 0:
+                return True
         
+        return False
+    
+    max_workers = encode_workers(len(tasks), hwenc)
+    
+    spinner = Spinner(f"    Extracting {len(tasks)} scenes ({max_workers} at a time)...")
+    spinner.start()
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            succeeded = list(executor.map(extract_scene, tasks))
+    finally:
         spinner.stop()
-        
-        if result.returncode == 0:
+    
+    scene_files = []
+    for (scene_number, _, _, scene_file), ok in zip(tasks, succeeded):
+        if ok:
             scene_files.append(scene_file)
         else:
-            print(f"    ⚠ Warning: Failed to create scene {i+1}")
+            print(f"    ⚠ Warning: Failed to create scene {scene_number}")
     
     print(f"\n✓ Created {len(scene_files)} scene clips")
     
     return scene_files
 
 
+def detect_scenes(video_file, output_dir="scenes", threshold=0.3, hwenc=None):
+    """
+    Detect scene changes in a video and split it into scene clips.
+    
+    Args:
+        video_file: Path to input video
+        output_dir: Directory to save scene clips
+        threshold: Scene detection threshold (0.0-1.0, lower=more sensitive)
+        hwenc: Hardware encoder for the scene clips (None = libx264)
+    
+    Returns:
+        List of paths to created scene clip files (empty if no scene changes)
+    """
+    # Detect scene changes
+    scene_times, duration = detect_scene_changes(video_file, threshold)
+    
+    if len(scene_times) <= 1:
+        print("\n⚠ No scene changes detected!")
+        print("  The video appears to be a single continuous shot.")
+        print("  Try lowering the threshold (e.g., 0.2 or 0.1)")
+        return []
+    
+    # Split into scene clips
+    scene_files = split_video_into_scenes(video_file, scene_times, duration, output_dir, hwenc)
+    
+    # Print summary
+    print("\n" + "="*60)
+    print("✅ Scene detection complete!")
+    print(f"   Detected scenes: {len(scene_times)}")
+    print(f"   Created clips:   {len(scene_files)}")
+    print(f"   Output dir:      {output_dir}")
+    print("="*60)
+    
+    # Show scene durations
+    print("\nScene durations:")
+    shown = scene_files[:10]
+    with ThreadPoolExecutor(max_workers=max(1, len(shown))) as executor:
+        shown_durations = list(executor.map(get_media_duration, shown))
+    for i, (scene_file, scene_duration) in enumerate(zip(shown, shown_durations), 1):
+        print(f"  Scene {i:2d}: {scene_duration:6.2f}s - {Path(scene_file).name}")
+    
+    if len(scene_files) > 10:
+        print(f"  ... and {len(scene_files) - 10} more scenes")
+    
+    return scene_files
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python detect_scenes.py <video_file> [output_dir] [threshold]")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    
+    if len(args) < 1:
+        print("Usage: python detect_scenes.py <video_file> [output_dir] [threshold] [--hwenc=ENCODER]")
         print("\nArguments:")
         print("  video_file  - Path to input video file")
         print("  output_dir  - Directory for scene clips (default: scenes/)")
         print("  threshold   - Scene detection sensitivity 0.0-1.0 (default: 0.3)")
+        print("\nOptions:")
+        print("  --hwenc=ENCODER - Video encoder: nvenc, qsv, vt, vaapi, or none for libx264")
+        print("                    (default: auto-detect a working hardware encoder)")
         print("\nExample:")
         print("  python detect_scenes.py example/Example.mp4")
         print("  python detect_scenes.py example/Example.mp4 my_scenes 0.4")
+        print("  python detect_scenes.py example/Example.mp4 my_scenes 0.4 --hwenc=none")
         sys.exit(1)
     
-    video_file = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else "scenes"
-    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else 0.3
+    video_file = args[0]
+    output_dir = args[1] if len(args) > 1 else "scenes"
+    threshold = float(args[2]) if len(args) > 2 else 0.3
+    hwenc = "auto"
+    
+    for arg in sys.argv[1:]:
+        if arg.startswith("--hwenc="):
+            hwenc = arg.split("=")[1]
+    
+    try:
+        hwenc = resolve_hwenc(hwenc)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
     
     if not os.path.exists(video_file):
         print(f"❌ Error: Video file not found: {video_file}")
         sys.exit(1)
     
     try:
-        # Detect scene changes
-        scene_times, duration = detect_scene_changes(video_file, threshold)
+        scene_files = detect_scenes(video_file, output_dir, threshold, hwenc)
         
-        if len(scene_times) <= 1:
-            print("\n⚠ No scene changes detected!")
-            print("  The video appears to be a single continuous shot.")
-            print("  Try lowering the threshold (e.g., 0.2 or 0.1)")
+        if not scene_files:
             sys.exit(0)
         
-        # Split into scene clips
-        scene_files = split_video_into_scenes(video_file, scene_times, duration, output_dir)
-        
-        # Print summary
-        print("\n" + "="*60)
-        print("✅ Scene detection complete!")
-        print(f"   Detected scenes: {len(scene_times)}")
-        print(f"   Created clips:   {len(scene_files)}")
-        print(f"   Output dir:      {output_dir}")
-        print("="*60)
-        
-        # Show scene durations
-        print("\nScene durations:")
-        for i, scene_file in enumerate(scene_files[:10], 1):
-            scene_duration = get_duration(scene_file)
-            print(f"  Scene {i:2d}: {scene_duration:6.2f}s - {Path(scene_file).name}")
-        
-        if len(scene_files) > 10:
-            print(f"  ... and {len(scene_files) - 10} more scenes")
-        
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
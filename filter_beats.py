@@ -5,6 +5,7 @@ Filters beat timestamps to keep only downbeats (every 4th beat for 4/4 time).
 """
 
 import sys
+import numpy as np
 
 
 def filter_beats_to_measures(input_file, output_file="measures.txt", beats_per_measure=4):
@@ -19,11 +20,20 @@ def filter_beats_to_measures(input_file, output_file="measures.txt", beats_per_m
         beats_per_measure: Number of beats per measure (default: 4 for 4/4 time)
     
     Returns:
-        List of measure timestamps
+        Array of measure timestamps
     """
     print(f"Reading beats from: {input_file}")
+    beat_times = load_beats(input_file)
+    print(f"✓ Read {len(beat_times)} beats")
+    
+    return filter_measures(beat_times, output_file, beats_per_measure, source=input_file)
+
+
+def load_beats(input_file):
+    """Read beat timestamps from a beats.txt or beats.npy file."""
+    if str(input_file).endswith('.npy'):
+        return np.load(input_file)
     
-    # Read beat timestamps from file
     beat_times = []
     with open(input_file, 'r') as f:
         for line in f:
@@ -41,36 +51,55 @@ def filter_beats_to_measures(input_file, output_file="measures.txt", beats_per_m
             except (ValueError, IndexError):
                 continue
     
-    print(f"✓ Read {len(beat_times)} beats")
+    return beat_times
+
+
+def filter_measures(beat_times, output_file="measures.txt", beats_per_measure=4, source=None):
+    """
+    Keep only downbeats (measure starts) from a sequence of beat times.
+    
+    Args:
+        beat_times: Beat timestamps in seconds
+        output_file: Path to output file for measure timestamps (None = don't save).
+                     A .npy path saves a binary float64 array instead of text.
+        beats_per_measure: Number of beats per measure (default: 4 for 4/4 time)
+        source: Where the beats came from, noted in the output file header
     
+    Returns:
+        Array of measure timestamps
+    """
     # Filter to keep only every Nth beat (downbeats)
-    measure_times = []
-    for i in range(0, len(beat_times), beats_per_measure):
-        measure_times.append(beat_times[i])
+    measure_times = np.asarray(beat_times, dtype=np.float64)[::beats_per_measure]
     
     print(f"✓ Filtered to {len(measure_times)} measures (every {beats_per_measure} beats)")
     
     # Calculate BPM from measure intervals
     if len(measure_times) > 1:
-        intervals = [measure_times[i+1] - measure_times[i] for i in range(len(measure_times)-1)]
-        avg_measure_duration = sum(intervals) / len(intervals)
+        avg_measure_duration = float(np.diff(measure_times).mean())
         measures_per_minute = 60.0 / avg_measure_duration
         print(f"✓ Average: {measures_per_minute:.1f} measures per minute")
         print(f"✓ That's {measures_per_minute * beats_per_measure:.1f} BPM")
     
     # Save measure timestamps
-    print(f"\nSaving measure timestamps to: {output_file}")
-    with open(output_file, 'w') as f:
-        f.write(f"# Measure timestamps (every {beats_per_measure} beats)\n")
-        f.write(f"# Filtered from: {input_file}\n")
-        f.write(f"# Total measures: {len(measure_times)}\n")
-        f.write(f"# Format: measure_number, timestamp_seconds\n")
-        f.write("#\n")
+    if output_file and str(output_file).endswith('.npy'):
+        print(f"\nSaving measure timestamps to: {output_file}")
+        np.save(output_file, measure_times)
+        print(f"✓ Saved {len(measure_times)} measure timestamps")
+    elif output_file:
+        print(f"\nSaving measure timestamps to: {output_file}")
+        header = f"# Measure timestamps (every {beats_per_measure} beats)\n"
+        if source:
+            header += f"# Filtered from: {source}\n"
+        header += (
+            f"# Total measures: {len(measure_times)}\n"
+            f"# Format: measure_number, timestamp_seconds\n"
+            "#"
+        )
+        measure_numbers = np.arange(1, len(measure_times) + 1)
+        np.savetxt(output_file, np.column_stack([measure_numbers, measure_times]),
+                   fmt=['%d', '%.6f'], delimiter=', ', header=header, comments='')
         
-        for i, measure_time in enumerate(measure_times, 1):
-            f.write(f"{i}, {measure_time:.6f}\n")
-    
-    print(f"✓ Saved {len(measure_times)} measure timestamps")
+        print(f"✓ Saved {len(measure_times)} measure timestamps")
     
     # Print first 10 measures
     print("\nFirst 10 measures:")
@@ -93,8 +122,8 @@ def main():
     if len(sys.argv) < 2:
         print("Usage: python filter_beats.py <beats_file> [output_file] [beats_per_measure]")
         print("\nArguments:")
-        print("  beats_file        - Input beats.txt file from detect_beats.py")
-        print("  output_file       - Output file for measures (default: measures.txt)")
+        print("  beats_file        - Input beats.txt (or .npy) file from detect_beats.py")
+        print("  output_file       - Output file for measures (default: measures.txt, .npy = binary)")
         print("  beats_per_measure - Beats per measure (default: 4 for 4/4 time)")
         print("\nExample:")
         print("  python filter_beats.py beats.txt")
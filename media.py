@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Shared Media Utility
+Duration probing and ffmpeg encoder settings shared by the pipeline steps.
+"""
+
+import os
+import subprocess
+
+try:
+    import av  # PyAV: in-process libavformat, avoids an ffprobe fork per probe
+except ImportError:
+    av = None
+
+
+# Hardware H.264 encoders selectable with --hwenc, in order of preference
+HW_ENCODERS = {
+    "nvenc": {"codec": "h264_nvenc", "args": ["-preset", "p4", "-tune", "hq", "-rc", "vbr", "-cq", "23"]},
+    "qsv": {"codec": "h264_qsv", "args": ["-global_quality", "23"]},
+    "vt": {"codec": "h264_videotoolbox", "args": ["-q:v", "60"]},
+    "vaapi": {
+        "codec": "h264_vaapi",
+        "args": ["-qp", "23"],
+        "device": ["-vaapi_device", "/dev/dri/renderD128"],
+        "filter": "format=nv12,hwupload",
+    },
+}
+
+# Consumer GPUs cap concurrent hardware encode sessions, so parallel
+# encoders are limited to this many when a hardware encoder is in use
+HW_MAX_SESSIONS = 3
+
+
+def encode_workers(n_tasks, hwenc=None):
+    """
+    Choose how many ffmpeg encodes to run at once.
+    
+    Each ffmpeg is already multi-threaded, so run about one per two cores,
+    and no more than the GPU's session limit when encoding in hardware.
+    
+    Args:
+        n_tasks: Number of encodes to run
+        hwenc: Hardware encoder name, or None for libx264
+    
+    Returns:
+        Worker count (at least 1)
+    """
+    max_workers = max(1, min(n_tasks, (os.cpu_count() or 2) // 2))
+    if hwenc:
+        max_workers = min(max_workers, HW_MAX_SESSIONS)
+    return max_workers
+
+
+def video_codec_args(hwenc=None, preset="medium", use_filter=True):
+    """
+    Build the ffmpeg video encoder arguments.
+    
+    Args:
+        hwenc: Hardware encoder name from HW_ENCODERS, or None for libx264
+        preset: libx264 preset used for software encoding
+        use_filter: Include the encoder's upload filter as -vf (disable when
+                    the caller appends it to its own filter graph)
+    
+    Returns:
+        List of ffmpeg arguments
+    """
+    if not hwenc:
+        return ["-c:v", "libx264", "-preset", preset, "-crf", "23"]
+    
+    spec = HW_ENCODERS[hwenc]
+    args = spec.get("device", []) + ["-c:v", spec["codec"]] + spec["args"]
+    if use_filter and "filter" in spec:
+        args += ["-vf", spec["filter"]]
+    return args
+
+
+def detect_hw_encoder():
+    """
+    Find the first hardware H.264 encoder that works on this machine.
+    
+    Returns:
+        Encoder name from HW_ENCODERS, or None if only software is available
+    """
+    try:
+        result = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"],
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    
+    for name, spec in HW_ENCODERS.items():
+        if spec["codec"] not in result.stdout:
+            continue
+        
+        # Encoders are listed whenever they are compiled in, even without the
+        # hardware, so confirm with a tiny test encode
+        cmd = [
+            "ffmpeg",
+            "-hide_banner",
+            "-f", "lavfi",
+            "-i", "color=black:size=256x256:duration=0.1",
+            *video_codec_args(name),
+            "-frames:v", "1",
+            "-f", "null",
+            "-"
+        ]
+        if subprocess.run(cmd, capture_output=True).returncode == 0:
+            return name
+    
+    return None
+
+
+def resolve_hwenc(choice):
+    """
+    Turn a --hwenc option value into an encoder name.
+    
+    Args:
+        choice: 'auto' (detect a working hardware encoder), 'none' (libx264)
+                or a name from HW_ENCODERS
+    
+    Returns:
+        Encoder name from HW_ENCODERS, or None for libx264
+    
+    Raises:
+        ValueError: If the encoder name is unknown
+    """
+    if choice == "auto":
+        return detect_hw_encoder()
+    if choice == "none":
+        return None
+    if choice not in HW_ENCODERS:
+        raise ValueError(f"Unknown encoder: {choice} (choose from {', '.join(HW_ENCODERS)}, none)")
+    return choice
+
+
+def get_media_duration(media_path):
+    """
+    Get duration of an audio or video file in seconds.
+    
+    Reads the container header in-process with PyAV when it is installed,
+    otherwise runs ffprobe.
+    """
+    if av is not None:
+        with av.open(media_path) as container:
+            if container.duration is not None:
+                return container.duration / av.time_base
+    
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        media_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip())
+
+
+def parse_metadata_log(log_lines, key):
+    """
+    Parse per-frame values printed by ffmpeg's metadata filter.
+    
+    Args:
+        log_lines: Iterable of stderr lines (e.g. a pipe, read as ffmpeg runs)
+                   from an ffmpeg run using metadata=print:key=<key>
+        key: Metadata key to collect, e.g. 'lavfi.scene_score'
+    
+    Returns:
+        List of (pts_time, value) tuples
+    """
+    values = []
+    frame_time = None
+    marker = f"{key}="
+    
+    for line in log_lines:
+        if 'Parsed_metadata' not in line:
+            continue
+        try:
+            # Format: ... frame:42   pts:1234   pts_time:146.112633
+            if 'pts_time:' in line:
+                frame_time = float(line.split('pts_time:')[1].split()[0])
+            # Format: ... lavfi.scene_score=0.412345
+            elif marker in line and frame_time is not None:
+                values.append((frame_time, float(line.split(marker)[1].split()[0])))
+                frame_time = None
+        except (ValueError, IndexError):
+            continue
+    
+    return values
@@ -10,7 +10,16 @@ import time
 
 
 class Spinner:
-    """A simple spinner to show progress during long operations."""
+    """
+    A simple spinner to show progress during long operations.
+    
+    Draws on stderr, and only when stderr is a terminal, so it never ends up
+    in logs or in captured stdout. If another spinner is already running
+    (e.g. while pipeline steps run in parallel), this one stays silent
+    rather than fighting over the same line.
+    """
+    
+    _active = threading.Lock()
     
     def __init__(self, message="Processing"):
         self.message = message
@@ -23,13 +32,15 @@ class Spinner:
         """Run the spinner animation."""
         while self.running:
             frame = self.frames[self.frame_index % len(self.frames)]
-            sys.stdout.write(f"\r{frame} {self.message}")
-            sys.stdout.flush()
+            sys.stderr.write(f"\r{frame} {self.message}")
+            sys.stderr.flush()
             self.frame_index += 1
             time.sleep(0.1)
     
     def start(self):
         """Start the spinner."""
+        if not sys.stderr.isatty() or not Spinner._active.acquire(blocking=False):
+            return
         self.running = True
         self.thread = threading.Thread(target=self._spin)
         self.thread.daemon = True
@@ -37,8 +48,10 @@ class Spinner:
     
     def stop(self):
         """Stop the spinner and clear the line."""
+        if not self.running:
+            return
         self.running = False
-        if self.thread:
-            self.thread.join()
-        sys.stdout.write("\r" + " " * (len(self.message) + 3) + "\r")
-        sys.stdout.flush()
+        self.thread.join()
+        sys.stderr.write("\r" + " " * (len(self.message) + 3) + "\r")
+        sys.stderr.flush()
+        Spinner._active.release()